@@ -1,9 +1,13 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 from app.api.routes.websocket import router as websocket_router
-from app.services.auth_services import router as auth_router
+from app.api.routes.workout_websocket import router as workout_websocket_router
+from app.services.auth_services import router as auth_router, ensure_indexes
+from app.api.routes.comunity import router as community_router, ensure_community_indexes
+from app.services.session_manager import session_manager
 
 app = FastAPI()
 
@@ -17,7 +21,43 @@ app.add_middleware(
 )
 
 app.include_router(websocket_router)
+app.include_router(workout_websocket_router)
 app.include_router(auth_router)
+app.include_router(community_router)
+
+@app.on_event("startup")
+def warm_up_pose_pool():
+    session_manager.start()
+
+@app.on_event("startup")
+async def create_indexes():
+    # In the background: the websocket routes don't need MongoDB, so a slow or
+    # unreachable database must not hold up startup. /likepost checks its own
+    # index before serving, so likes are never counted without it. Backfilling
+    # old posts scans the collection and is left to `python -m app.api.routes.comunity`.
+    asyncio.create_task(retry_until_done(ensure_indexes, "auth indexes"))
+    asyncio.create_task(retry_until_done(ensure_community_indexes, "community indexes"))
+
+async def retry_until_done(setup, name, max_delay=60):
+    """Run `setup` until it succeeds, backing off between attempts."""
+    delay = 1
+    while True:
+        try:
+            await setup()
+            return
+        except Exception as e:
+            print(f"Could not set up {name}, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+@app.on_event("shutdown")
+def close_pose_pool():
+    session_manager.stop()
+
+@app.get("/metrics/inference")
+def inference_metrics():
+    """Queue depth and batch sizes of the inference scheduler."""
+    return session_manager.service.metrics()
 
 @app.get("/")
 def home():
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 from typing import List
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from ...models.community_post import CommunityPost
+from ...services.like_buffer import LikeCountBuffer
+from ...core.config import COMMUNITY_LIKE_BUFFER, FEED_PAGE_SIZE, FEED_MAX_PAGE_SIZE, FEED_CACHE_TTL, FEED_CACHE_SIZE
 
 router = APIRouter()
 
@@ -21,6 +33,12 @@ print(client)
 db = client["auth_db"]
 users_collection = db["users"]
 community_collection = db["community_posts"]
+# One document per like, unique on (postId, userId); posts only keep the likeCount counter
+likes_collection = db["community_likes"]
+
+# Posts are returned without likedUsers, which only posts not yet migrated still carry
+POST_PROJECTION = {"likedUsers": 0}
+DUPLICATE_KEY = 11000
 
 @router.post("/addpost", status_code=status.HTTP_201_CREATED)
 async def add_post(post: PostCreate):
@@ -32,48 +50,285 @@ async def add_post(post: PostCreate):
         userId=post.userId,
         content=post.content,
         likeCount=0,
-        likedUsers=[]
     )
-    result = await community_collection.insert_one(post_data.dict())
+    document = post_data.dict()
+    result = await community_collection.insert_one(document)
     if not result.inserted_id:
         raise HTTPException(detail="Post could not be created")
     
-    return {"post": result, "message": "Post created successfully"}
+    return {"post": jsonable_encoder(serialize_post(document)), "message": "Post created successfully"}
 
-@router.post("/likepost", status_code=status.HTTP_200_OK)
-async def like_post(like: LikePost):
-    existing_post = await community_collection.find_one({"_id": ObjectId(like.postId)})
-    if not existing_post:
+# Optional: like counts are coalesced in memory and flushed in batches
+like_buffer = LikeCountBuffer(community_collection) if COMMUNITY_LIKE_BUFFER else None
+
+@router.on_event("shutdown")
+async def flush_like_buffer():
+    if like_buffer is not None:
+        await like_buffer.close()
+
+
+def parse_post_id(post_id: str):
+    try:
+        return ObjectId(post_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid post id")
+
+
+def serialize_post(post):
+    if like_buffer is not None:
+        post["likeCount"] = post.get("likeCount", 0) + like_buffer.pending(post["_id"])
+    post["_id"] = str(post["_id"])
+    return post
+
+
+async def change_like_count(post_id, delta):
+    """Apply a like-count change to the post's counter; returns the post after it, or None if there is no such post."""
+    if like_buffer is not None:
+        post = await community_collection.find_one({"_id": post_id}, POST_PROJECTION)
+        if post is not None:
+            like_buffer.add(post_id, delta)
+        return post
+    return await community_collection.find_one_and_update(
+        {"_id": post_id},
+        {"$inc": {"likeCount": delta}},
+        projection=POST_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+LIKES_INDEX = [("postId", 1), ("userId", 1)]
+_likes_index_ready = False
+
+
+async def ensure_likes_index():
+    """Create the unique (postId, userId) index, the only thing that stops a post being liked twice by one user.
+
+    Likes inserted twice before the index existed are removed first (and
+    their extra count taken off the post), since they would fail the build.
+    """
+    global _likes_index_ready
+    if _likes_index_ready:
+        return
+    try:
+        await likes_collection.create_index(LIKES_INDEX, unique=True, name="post_user")
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY:
+            raise
+        await remove_duplicate_likes()
+        await likes_collection.create_index(LIKES_INDEX, unique=True, name="post_user")
+    _likes_index_ready = True
+
+
+async def remove_duplicate_likes():
+    duplicates = likes_collection.aggregate([
+        {"$group": {"_id": {"postId": "$postId", "userId": "$userId"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    async for group in duplicates:
+        await likes_collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        # Every extra insert also incremented likeCount
+        await community_collection.update_one({"_id": group["_id"]["postId"]}, {"$inc": {"likeCount": 1 - group["count"]}})
+
+
+async def require_likes_index():
+    # Without the unique index a repeated like would be counted again, so refuse likes until it exists
+    try:
+        await ensure_likes_index()
+    except Exception as e:
+        print(f"Could not create the likes index: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Likes are temporarily unavailable, try again later")
+
+
+async def ensure_post_exists(post_id):
+    # Only reached when the like itself could not be added or removed
+    if not await community_collection.find_one({"_id": post_id}, {"_id": 1}):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    if like.userId in existing_post["likedUsers"]:
+
+@router.post("/likepost", status_code=status.HTTP_200_OK, dependencies=[Depends(require_likes_index)])
+async def like_post(like: LikePost):
+    post_id = parse_post_id(like.postId)
+    try:
+        # The unique (postId, userId) index makes "not liked yet" and the insert one atomic step
+        await likes_collection.insert_one({"postId": post_id, "userId": like.userId, "createdAt": datetime.utcnow()})
+    except DuplicateKeyError:
+        await ensure_post_exists(post_id)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already liked this post")
 
-    update_result = await community_collection.update_one(
-        {"_id": ObjectId(like.postId)},
-        {"$inc": {"likeCount": 1}, "$push": {"likedUsers": like.userId}}
-    )
-    if update_result.modified_count == 0:
-        raise HTTPException(detail="Could not like the post")
+    post = await change_like_count(post_id, 1)
+    if post is None:
+        await likes_collection.delete_one({"postId": post_id, "userId": like.userId})
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    return {"message": "Post liked successfully", "post": existing_post}
+    return {"message": "Post liked successfully", "post": serialize_post(post)}
 
 
 
 @router.post("/dislikepost", status_code=status.HTTP_200_OK)
 async def dislike_post(like: LikePost):
-    existing_post = await community_collection.find_one({"_id": ObjectId(like.postId)})
-    if not existing_post:
+    post_id = parse_post_id(like.postId)
+    result = await likes_collection.delete_one({"postId": post_id, "userId": like.userId})
+    if result.deleted_count == 0:
+        await ensure_post_exists(post_id)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User has not liked this post")
+
+    post = await change_like_count(post_id, -1)
+    if post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    if like.userId not in existing_post["likedUsers"]:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User has not liked this post")
+    return {"message": "Post disliked successfully", "post": serialize_post(post)}
 
-    update_result = await community_collection.update_one(
-        {"_id": ObjectId(like.postId)},
-        {"$inc": {"likeCount": -1}, "$pull": {"likedUsers": like.userId}}
+
+@router.get("/liked")
+async def liked_posts(userId: str, postIds: str = Query(..., description="comma-separated post ids")):
+    """Which of `postIds` the user has liked, answered from the (postId, userId) index."""
+    ids = [parse_post_id(post_id) for post_id in postIds.split(",") if post_id]
+    if len(ids) > FEED_MAX_PAGE_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {FEED_MAX_PAGE_SIZE} post ids per request")
+    cursor = likes_collection.find({"postId": {"$in": ids}, "userId": userId}, {"postId": 1, "_id": 0})
+    liked = {doc["postId"] async for doc in cursor}
+    return {"liked": {str(post_id): post_id in liked for post_id in ids}}
+
+
+async def migrate_liked_users():
+    """Move likedUsers arrays from existing posts into the likes collection.
+
+    Safe to run repeatedly and while the server is live: only posts that
+    still carry likedUsers are visited and duplicates are absorbed by the
+    unique index. likeCount already counts the array, so it is only
+    corrected, with $inc, for users who have liked the post again through
+    the likes collection since; an increment can't overwrite live likes or
+    buffered counts the way resetting the total could. Returns the number
+    of posts migrated.
+    """
+    await ensure_likes_index()
+    migrated = 0
+    posts = community_collection.find({"likedUsers.0": {"$exists": True}}, {"likedUsers": 1})
+    async for post in posts:
+        now = datetime.utcnow()
+        likes = [
+            {"postId": post["_id"], "userId": user_id, "createdAt": now, "migrated": True}
+            for user_id in set(post["likedUsers"])
+        ]
+        duplicates = []
+        try:
+            await likes_collection.insert_many(likes, ordered=False)
+        except BulkWriteError as e:
+            # Likes that already exist are fine; anything else is a real failure
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            duplicates = [likes[error["index"]]["userId"] for error in errors]
+        # Likes left by an interrupted earlier run are marked migrated and were only counted once
+        double_counted = await likes_collection.count_documents(
+            {"postId": post["_id"], "userId": {"$in": duplicates}, "migrated": {"$ne": True}}
+        ) if duplicates else 0
+        await community_collection.update_one(
+            {"_id": post["_id"]},
+            {"$inc": {"likeCount": -double_counted}, "$unset": {"likedUsers": ""}},
+        )
+        migrated += 1
+    # Posts whose array was empty just lose the field
+    await community_collection.update_many({"likedUsers": {"$exists": True}}, {"$unset": {"likedUsers": ""}})
+    return migrated
+
+
+# Newest first; _id breaks ties between posts created in the same millisecond
+FEED_SORT = [("createdAt", -1), ("_id", -1)]
+
+# (limit, cursor) -> (expires_at, etag, body) for recently served pages
+_feed_cache = OrderedDict()
+
+
+async def ensure_community_indexes():
+    """Create the feed and like indexes. Cheap when they exist, so it runs on every start."""
+    await community_collection.create_index(FEED_SORT, name="feed")
+    await ensure_likes_index()
+
+
+async def migrate_community_posts():
+    """Bring posts from older versions up to date.
+
+    Posts from before createdAt existed get their ObjectId's creation time,
+    and likedUsers arrays are moved into the likes collection. Both steps
+    scan the whole collection, so this runs once per deploy from main()
+    rather than on every server start. Returns the number of posts whose
+    likes were migrated.
+    """
+    await ensure_community_indexes()
+    await community_collection.update_many(
+        {"createdAt": {"$exists": False}},
+        [{"$set": {"createdAt": {"$toDate": "$_id"}}}],
     )
-    if update_result.modified_count == 0:
-        raise HTTPException(detail="Could not dislike the post")
+    return await migrate_liked_users()
+
+
+# MongoDB hands back naive UTC datetimes at millisecond precision
+def encode_feed_cursor(post):
+    millis = round(post["createdAt"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return f"{millis}:{post['_id']}"
+
+
+def decode_feed_cursor(cursor):
+    try:
+        millis, last_id = cursor.split(":")
+        return datetime.fromtimestamp(int(millis) / 1000, timezone.utc).replace(tzinfo=None), ObjectId(last_id)
+    except (ValueError, InvalidId, OverflowError, OSError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def feed_page(limit, cursor=None):
+    """One page of posts, newest first, continuing after `cursor` (keyset pagination on the feed index)."""
+    query = {}
+    if cursor:
+        created, last_id = decode_feed_cursor(cursor)
+        query = {"$or": [
+            {"createdAt": {"$lt": created}},
+            {"createdAt": created, "_id": {"$lt": last_id}},
+        ]}
+
+    posts = await community_collection.find(query, POST_PROJECTION).sort(FEED_SORT).limit(limit).to_list(limit)
+    next_cursor = encode_feed_cursor(posts[-1]) if len(posts) == limit else None
+    return {"posts": [serialize_post(post) for post in posts], "next_cursor": next_cursor}
+
+
+async def cached_feed_page(limit, cursor):
+    """(etag, body) of a page, reused for FEED_CACHE_TTL seconds so polling clients don't hit MongoDB."""
+    key = (limit, cursor)
+    cached = _feed_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        _feed_cache.move_to_end(key)
+        return cached[1], cached[2]
+
+    body = json.dumps(jsonable_encoder(await feed_page(limit, cursor)), separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    _feed_cache[key] = (time.monotonic() + FEED_CACHE_TTL, etag, body)
+    _feed_cache.move_to_end(key)
+    while len(_feed_cache) > FEED_CACHE_SIZE:
+        _feed_cache.popitem(last=False)
+    return etag, body
+
+
+@router.get("/feed")
+async def get_feed(
+    request: Request,
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=FEED_MAX_PAGE_SIZE),
+    cursor: str = None,
+):
+    etag, body = await cached_feed_page(limit, cursor)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # Unchanged since the client's last poll: no body needed
+    if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def main():
+    # Run once ahead of deploying a version that changes the post schema:
+    #     python -m app.api.routes.comunity
+    migrated = asyncio.run(migrate_community_posts())
+    print(f"Migrated likes of {migrated} posts")
+
 
-    return {"message": "Post disliked successfully", "post": existing_post}
+if __name__ == "__main__":
+    main()
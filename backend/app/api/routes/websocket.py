@@ -1,54 +1,152 @@
+import asyncio
 import cv2
-import numpy as np
 import json
-import base64
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.services.exercise_tracker import ExerciseTracker
+import time
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from app.services.pose_pool import PoolExhausted
+from app.services.inference_service import decode_frame
+from app.services.frame_protocol import receive_message, parse_message
+from app.services.session_manager import session_manager
+from app.services.exercise_tracker import EXERCISE_REGISTRY
+from app.services.pose_profiles import POSE_PROFILES
+from app.services.smoothing import LANDMARK_FILTERS
+from app.services.landmarks import to_pixels
 
 router = APIRouter()
-exercise_inst = ExerciseTracker()
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    # Production path: feedback JSON only, nothing is drawn
+    await serve_session(websocket, render=False)
+
+
+@router.websocket("/ws/annotated")
+async def annotated_websocket_endpoint(websocket: WebSocket):
+    """Same as /ws, but also streams each frame back as a JPEG with the skeleton drawn on it."""
+    await serve_session(websocket, render=True)
+
+
+async def serve_session(websocket: WebSocket, render):
     await websocket.accept()
     print("Client connected")
 
+    # The client may declare its exercise, pose profile, landmark filter and inference interval
+    # up front (/ws?exercise=plank&profile=lite&smoothing=one_euro&infer_every=3)
+    exercise = websocket.query_params.get("exercise")
+    profile = websocket.query_params.get("profile")
+    smoothing = websocket.query_params.get("smoothing")
+    infer_every = websocket.query_params.get("infer_every")
+    error = None
+    if exercise is not None and exercise not in EXERCISE_REGISTRY:
+        error = f"Unknown exercise: {exercise}"
+    elif profile is not None and profile not in POSE_PROFILES:
+        error = f"Unknown pose profile: {profile}"
+    elif smoothing is not None and smoothing not in LANDMARK_FILTERS:
+        error = f"Unknown landmark filter: {smoothing}"
+    elif infer_every is not None and not (infer_every.isdigit() and int(infer_every) > 0):
+        error = "infer_every must be a positive integer"
+    if error:
+        await websocket.send_text(json.dumps({"error": error}))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if infer_every is not None:
+        infer_every = int(infer_every)
+
+    try:
+        # Each connection gets its own tracker; a pose estimator is leased on its first image frame
+        async with session_manager.session(exercise, render, profile, smoothing, infer_every) as session:
+            await track_session(websocket, session)
+
+    except PoolExhausted as e:
+        print(f"Rejecting client: {e}")
+        await websocket.send_text(json.dumps({"error": "Server busy, try again later"}))
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
+
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        await websocket.close()
+
+    finally:
+        print("Connection closed")
+
+
+async def receive_frames(websocket: WebSocket, mailbox):
+    """Keep reading from the socket so a slow frame never leaves newer ones queued behind it."""
     try:
         while True:
-            try:
-                
-                # Receive the data from the client
-                data = await websocket.receive_text()
+            mailbox.put(await receive_message(websocket))
+    except Exception as e:
+        mailbox.close(e)
+
+
+async def track_session(websocket: WebSocket, session):
+    """Process frames for one connection until the client disconnects."""
+    exercise_inst = session.tracker
+    receiver = asyncio.create_task(receive_frames(websocket, session.mailbox))
+    try:
+        while True:
+            # Only the newest pending frame is processed; older ones are dropped
+            data = await session.mailbox.get()
+            started = time.perf_counter()
 
-                # Parse the incoming data (expecting a JSON object)
-                parsed_data = json.loads(data)
-                frame_data = base64.b64decode(parsed_data.get("frame"))  # Decode the base64 frame
-                target=parsed_data.get("target",None)
-                # Convert the decoded byte data to a numpy array
-                np_arr = np.frombuffer(frame_data, np.uint8)
-                img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+            try:
+                message = parse_message(data)
+                target = message.target
+                # Clients that skipped the query string can declare it in a frame message instead
+                if exercise_inst.exercise is None and message.exercise is not None:
+                    session.set_exercise(message.exercise)
+                # Durations follow the client's capture timestamps, not when the server got to the frame
+                frame_time = session.timeline.time_of(message.timestamp)
+                if message.landmarks is not None:
+                    # Pose was estimated on the device: no decoding or inference needed
+                    img = None
+                    landmarks = message.landmarks
+                    shape = message.size
+                else:
+                    # Decode off the event loop so other sockets keep being served
+                    img = await decode_frame(message.frame)
+                    # Pose detection runs in an inference worker process (or is extrapolated in skip-frame mode)
+                    landmarks = await session.detect(img, frame_time)
+                    shape = img.shape
 
-                # Process the frame with pose detection
-                img, lmList = exercise_inst.process_frame(img)
+                # Smooth out jitter before the rep state machines see it
+                landmarks = session.smooth(landmarks, frame_time)
+                lmList = to_pixels(landmarks, shape)
 
                 # Track all exercises and get feedback
-                feedback = exercise_inst.track_exercises(img, lmList, target)
+                feedback = exercise_inst.track_exercises(img, lmList, target, frame_time)
+                if message.seq is not None:
+                    feedback["seq"] = message.seq
+
+                # Tell the client how many frames were skipped and how fast to send
+                session.rate.observe(time.perf_counter() - started)
+                feedback["dropped_frames"] = session.mailbox.dropped
+                feedback["suggested_interval_ms"] = session.rate.suggested_interval_ms
 
                 # Send only the feedback data (without image)
                 await websocket.send_text(json.dumps(feedback))
 
+                # Annotated sessions also get the drawn frame as a binary message (when there is a frame)
+                if exercise_inst.render and img is not None:
+                    await websocket.send_bytes(await asyncio.to_thread(encode_annotated, exercise_inst, img, lmList))
+
+            except PoolExhausted:
+                # No estimator for this session's first image frame: let serve_session reject the client
+                raise
+
             except Exception as e:
                 print(f"Error processing frame: {e}")
                 # Send an error message if something goes wrong
                 error_message = json.dumps({"error": str(e)})
                 await websocket.send_text(error_message)
-
-    except WebSocketDisconnect:
-        print("Client disconnected")
-    
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-    
     finally:
-        await websocket.close()
-        print("Connection closed")
+        receiver.cancel()
+
+
+def encode_annotated(exercise_inst, img, lmList):
+    exercise_inst.draw_skeleton(img, lmList)
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return encoded.tobytes()
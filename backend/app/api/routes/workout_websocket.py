@@ -1,114 +1,101 @@
-import asyncio
 import json
-import cv2
-import numpy as np
-import mediapipe as mp
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, APIRouter
-import base64
-import math
-import os
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, status
+from app.services.inference_service import decode_frame
+from app.services.frame_protocol import receive_message, parse_message
+from app.services.pose_pool import PoolExhausted
+from app.services.session_manager import session_manager
+from app.services.reference_store import get_routine
+from app.services.accuracy import score_frames, WEIGHT_PRESETS, DEFAULT_DISTANCE_THRESHOLD
+from app.services.alignment import IncrementalDTW
+from app.core.config import DEFAULT_ROUTINE
 
 
 router = APIRouter()
 
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-
-def load_stored_landmarks():
-    json_file_path = os.path.join(os.path.dirname(__file__), 'selected_landmarks.json')
-    with open(json_file_path, 'r') as file:
-        data = json.load(file)
-    return data  
-
-stored_landmarks = load_stored_landmarks()
+def calculate_accuracy(user_landmarks, stored_landmarks, frame_index, distance_threshold=DEFAULT_DISTANCE_THRESHOLD, weights=None):
+    """Calculate the accuracy of detected landmarks."""
+    stored_frame = stored_landmarks.frame(frame_index)
 
-def process_frame(frame):
-    """Process the frame to detect landmarks using MediaPipe"""
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = pose.process(frame_rgb)
-    return result
+    if user_landmarks is None or stored_frame is None:
+        return 0
 
-def calculate_accuracy(user_landmarks, stored_landmarks, frame_index, distance_threshold=10):
-    """Calculate the accuracy of detected landmarks."""
-    matched_landmarks = 0
-    total_landmarks = 0
-
-    stored_frame = stored_landmarks.get(f"frame_{frame_index}", {})
-
-    for landmark, stored_coords in stored_frame.items():
-        if landmark in user_landmarks:
-            user_coords = user_landmarks[landmark]
-            distance = euclidean_distance(user_coords, stored_coords)
-            if distance <= distance_threshold:
-                matched_landmarks += 1
-            total_landmarks += 1
-y
-    if total_landmarks == 0:
-        return 0  # Avoid division by zero
-    accuracy = (matched_landmarks / total_landmarks) * 100
-    return accuracy
-
-def euclidean_distance(point1, point2):
-    """Calculate Euclidean distance between two points"""
-    return math.sqrt((point1['x'] - point2['x'])**2 + (point1['y'] - point2['y'])**2 + (point1['z'] - point2['z'])**2)
-
-def decode_base64_to_frame(base64_data):
-    """Decode a base64 string to an OpenCV frame"""
-    img_data = base64.b64decode(base64_data)
-    nparr = np.frombuffer(img_data, np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    return frame
+    # All landmarks are compared in one vectorized pass; NaN (unrecorded) landmarks are skipped
+    return score_frames(user_landmarks, stored_frame, distance_threshold, weights)
 
 def extract_landmarks(result):
-    """Extract landmarks from the MediaPipe result"""
-    landmarks = {}
-    if result.pose_landmarks:
-        for landmark in mp_pose.PoseLandmark:
-            point = result.pose_landmarks.landmark[landmark]
-            landmarks[landmark.name] = {"x": point.x, "y": point.y, "z": point.z}
-    return landmarks
-
-@app.websocket("/ws/workout")
+    """Keep the x, y, z columns of the (33, 4) array returned by the inference service"""
+    if result is None:
+        return None
+    return result[:, :3]
+
+@router.websocket("/ws/workout")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("client connected")
-    frame_index = 1  # Set a default frame_index (this can be dynamic if you want to track it)
     try:
-        while True:
-            try:
-                # Receive the frame from the websocket
-                frame_base64 = await websocket.receive_text()
-
-                # Decode the base64 frame
-                frame = decode_base64_to_frame(frame_base64)
-
-                # Process the frame and extract landmarks
-                result = process_frame(frame)
-                user_landmarks = extract_landmarks(result)
-
-                # Calculate the accuracy based on stored landmarks
-                accuracy = calculate_accuracy(user_landmarks, stored_landmarks, frame_index)
-
-                # Send the accuracy back to the client
-                await websocket.send_json({
-                    "accuracy": accuracy
-                })
-
-                # Increment frame_index (or dynamically assign based on your logic)
-                frame_index += 1
-            
-            except Exception as e:
-                print(f"Error processing frame: {e}")
-                # Send an error message if something goes wrong
-                error_message = json.dumps({"error": str(e)})
-                await websocket.send_text(error_message)
+        # Reference routines are memory-mapped once per process and shared by all sessions
+        stored_landmarks = await get_routine(websocket.query_params.get("routine", DEFAULT_ROUTINE))
+        weights_name = websocket.query_params.get("weights", "uniform")
+        if weights_name not in WEIGHT_PRESETS:
+            raise ValueError(f"Unknown weights: {weights_name}")
+        weights = WEIGHT_PRESETS[weights_name]
+    except (ValueError, FileNotFoundError) as e:
+        await websocket.send_text(json.dumps({"error": str(e)}))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        async with session_manager.pool.lease() as pose:
+            await score_workout(websocket, pose, stored_landmarks, weights)
+
+    except PoolExhausted as e:
+        print(f"Rejecting client: {e}")
+        await websocket.send_text(json.dumps({"error": "Server busy, try again later"}))
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
 
     except WebSocketDisconnect:
         print("Client disconnected")
 
     except Exception as e:
         print(f"Unexpected error: {e}")
-    
-    finally:
         await websocket.close()
+
+    finally:
         print("Connection closed")
+
+async def score_workout(websocket: WebSocket, pose, stored_landmarks, weights=None):
+    """Score each received frame against the stored routine until the client disconnects."""
+    # Follow the user through the routine at their own pace instead of one reference frame per received frame
+    matcher = IncrementalDTW(stored_landmarks.landmarks)
+    while True:
+        # Receive the frame from the websocket (binary frame or legacy base64 text)
+        data = await receive_message(websocket)
+
+        try:
+            message = parse_message(data)
+            if message.landmarks is not None:
+                # Landmarks computed on the device skip decoding and inference
+                result = message.landmarks
+            else:
+                frame = await decode_frame(message.frame)
+                # Process the frame in an inference worker and extract landmarks
+                result = await pose.process(frame)
+            user_landmarks = extract_landmarks(result)
+
+            # Align to the reference frame the user is actually at, then score against it
+            if user_landmarks is not None:
+                matcher.update(user_landmarks)
+            frame_index = stored_landmarks.first_frame + matcher.index
+            accuracy = calculate_accuracy(user_landmarks, stored_landmarks, frame_index, weights=weights)
+
+            # Send the accuracy back to the client
+            response = {"accuracy": accuracy, "reference_frame": frame_index}
+            if message.seq is not None:
+                response["seq"] = message.seq
+            await websocket.send_json(response)
+        
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            # Send an error message if something goes wrong
+            error_message = json.dumps({"error": str(e)})
+            await websocket.send_text(error_message)
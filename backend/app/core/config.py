@@ -0,0 +1,93 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker processes that own the MediaPipe Pose graphs
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", os.cpu_count() or 1))
+
+# Sessions (shared memory slots) served by each worker. Frames are only micro-batched when a worker
+# has more than one, since a session never has more than one frame in flight
+INFERENCE_SLOTS_PER_WORKER = int(os.getenv("INFERENCE_SLOTS_PER_WORKER", 4))
+
+# Number of pose estimators kept warm for sessions that send images (one per connection)
+POSE_POOL_SIZE = int(os.getenv("POSE_POOL_SIZE", INFERENCE_WORKERS * INFERENCE_SLOTS_PER_WORKER))
+
+# Seconds a connection waits for a free estimator before it is rejected
+POSE_POOL_ACQUIRE_TIMEOUT = float(os.getenv("POSE_POOL_ACQUIRE_TIMEOUT", 2.0))
+
+# Longest side (px) a frame is downscaled to before pose inference
+INFERENCE_MAX_SIDE = int(os.getenv("INFERENCE_MAX_SIDE", 640))
+
+# Largest frame (in bytes) a session can hand to a worker through shared memory. Frames are
+# downscaled first, so one BGR square at INFERENCE_MAX_SIDE is enough (~1.2 MB per slot at 640)
+INFERENCE_MAX_FRAME_BYTES = int(os.getenv("INFERENCE_MAX_FRAME_BYTES", INFERENCE_MAX_SIDE ** 2 * 3))
+
+# Seconds to wait for a worker to answer before the frame is reported as failed
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", 5.0))
+
+# Bounds (ms) for the send interval suggested to /ws clients
+FRAME_MIN_INTERVAL_MS = int(os.getenv("FRAME_MIN_INTERVAL_MS", 100))
+FRAME_MAX_INTERVAL_MS = int(os.getenv("FRAME_MAX_INTERVAL_MS", 1000))
+
+# Padding around the previous frame's landmarks, as a fraction of the person's size
+ROI_PADDING = float(os.getenv("ROI_PADDING", 0.3))
+
+# Pose profile (lite, full, heavy) used when neither the client nor the exercise picks one
+DEFAULT_POSE_PROFILE = os.getenv("DEFAULT_POSE_PROFILE", "full")
+
+# Queueing delay (ms) of inference requests, i.e. time spent waiting behind other frames rather than
+# being inferred, at which sessions are stepped down to lite, and the level it must fall back under
+# before their own profile is restored
+LOAD_SHED_HIGH_MS = float(os.getenv("LOAD_SHED_HIGH_MS", 50.0))
+LOAD_SHED_LOW_MS = float(os.getenv("LOAD_SHED_LOW_MS", 15.0))
+
+# Trainer video followed on measure_workout's /ws, and the landmark file extracted from it
+TRAINER_VIDEO_PATH = os.getenv("TRAINER_VIDEO_PATH", "")
+TRAINER_REFERENCE_PATH = os.getenv("TRAINER_REFERENCE_PATH", "trainer_reference.ref")
+
+# Directory holding reference workouts (<routine>.ref, or selected_landmarks-style <routine>.json to convert)
+REFERENCE_DIR = os.getenv("REFERENCE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "api", "routes"))
+DEFAULT_ROUTINE = os.getenv("DEFAULT_ROUTINE", "selected_landmarks")
+
+# Live DTW alignment: reference frames searched ahead of / behind the current match,
+# and the most reference frames one user frame may advance
+DTW_AHEAD = int(os.getenv("DTW_AHEAD", 30))
+DTW_BEHIND = int(os.getenv("DTW_BEHIND", 5))
+DTW_MAX_STEP = int(os.getenv("DTW_MAX_STEP", 4))
+
+# Temporal landmark filter applied per session before rep counting ("one_euro", "ema" or "none")
+LANDMARK_FILTER = os.getenv("LANDMARK_FILTER", "one_euro")
+# One-Euro tuning for normalized coordinates: cutoff (Hz) at rest and how fast it opens with speed
+ONE_EURO_MIN_CUTOFF = float(os.getenv("ONE_EURO_MIN_CUTOFF", 1.0))
+ONE_EURO_BETA = float(os.getenv("ONE_EURO_BETA", 10.0))
+# Seconds for the EMA filter to follow ~63% of a step change
+EMA_TIME_CONSTANT = float(os.getenv("EMA_TIME_CONSTANT", 0.1))
+
+# Skip-frame mode: run pose inference on every Nth frame (1 = every frame) and extrapolate in between
+INFER_EVERY_N_FRAMES = int(os.getenv("INFER_EVERY_N_FRAMES", 1))
+# Mean absolute difference (0-255) between downsampled grey frames that forces inference anyway
+SKIP_MOTION_THRESHOLD = float(os.getenv("SKIP_MOTION_THRESHOLD", 6.0))
+# Longest time (seconds) landmarks are extrapolated past the last inferred frame
+SKIP_MAX_EXTRAPOLATION = float(os.getenv("SKIP_MAX_EXTRAPOLATION", 0.5))
+
+# Micro-batching: most frames sent to a worker in one message, and how long (ms) a frame may wait
+# for others while its worker is busy (an idle worker gets frames immediately)
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", 8))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 3.0))
+
+# Leaderboard: default and largest page size, and seconds the top page is served from memory
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", 20))
+LEADERBOARD_MAX_PAGE_SIZE = int(os.getenv("LEADERBOARD_MAX_PAGE_SIZE", 100))
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", 10.0))
+
+# Coalesce community like-count increments in memory and write them in batches (for viral posts)
+COMMUNITY_LIKE_BUFFER = os.getenv("COMMUNITY_LIKE_BUFFER", "false").lower() in ("1", "true", "yes")
+# Seconds buffered like counts may wait before they are flushed to MongoDB
+COMMUNITY_LIKE_FLUSH_INTERVAL = float(os.getenv("COMMUNITY_LIKE_FLUSH_INTERVAL", 1.0))
+
+# Community feed: default and largest page size, and how long (seconds) recent pages are reused
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", 20))
+FEED_MAX_PAGE_SIZE = int(os.getenv("FEED_MAX_PAGE_SIZE", 100))
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", 2.0))
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", 256))
@@ -1,9 +1,10 @@
 from pydantic import BaseModel, Field
 from typing import List
+from datetime import datetime
 from bson import ObjectId
 
 class CommunityPost(BaseModel):
     userId: str
     content: str
     likeCount: int
-    likedUsers: List[str]
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
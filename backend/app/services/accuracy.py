@@ -0,0 +1,86 @@
+"""Vectorized accuracy scoring of user landmarks against a reference workout.
+
+Score a recorded session offline (from backend/):
+
+    python -m app.services.accuracy session.npy selected_landmarks --threshold 0.1
+"""
+import argparse
+import numpy as np
+from app.services.landmarks import NUM_LANDMARKS
+
+# Face landmarks (nose, eyes, ears, mouth) say little about exercise form
+BODY_WEIGHTS = np.ones(NUM_LANDMARKS, dtype=np.float32)
+BODY_WEIGHTS[:11] = 0.25
+
+WEIGHT_PRESETS = {
+    "uniform": None,
+    "body": BODY_WEIGHTS,
+}
+
+# Distance, in MediaPipe's normalized coordinates (x, y as fractions of the frame, z on
+# roughly the same scale as x), within which a landmark counts as matching the reference
+DEFAULT_DISTANCE_THRESHOLD = 0.1
+
+
+def score_frames(user_landmarks, reference_landmarks, distance_threshold=DEFAULT_DISTANCE_THRESHOLD, weights=None):
+    """Percentage of (weighted) landmarks within `distance_threshold` (normalized units) of the reference.
+
+    Both inputs are (33, 3+) for a single frame or (frames, 33, 3+) for a
+    batch; only x, y, z are compared. Landmarks that are NaN on either side
+    are left out. Returns a float for one frame, or a (frames,) array.
+    """
+    user = np.asarray(user_landmarks, dtype=np.float32)[..., :3]
+    reference = np.asarray(reference_landmarks, dtype=np.float32)[..., :3]
+    single = user.ndim == 2
+    if single:
+        user, reference = user[None], reference[None]
+
+    distances = np.sqrt(np.sum((user - reference) ** 2, axis=-1))  # (frames, 33)
+    valid = ~np.isnan(distances)
+    matched = valid & (np.where(valid, distances, np.inf) <= distance_threshold)
+
+    w = np.ones(distances.shape[-1], dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    total = valid @ w
+    accuracy = np.divide(matched @ w, total, out=np.zeros_like(total), where=total > 0) * 100
+
+    return float(accuracy[0]) if single else accuracy
+
+
+def score_recording(user_frames, routine, distance_threshold=DEFAULT_DISTANCE_THRESHOLD, weights=None, first_frame=None):
+    """Score a whole recorded session, frame by frame, against `routine` in one call.
+
+    User frame i is compared with reference frame `first_frame + i`; frames
+    past the end of the routine score 0.
+    """
+    user_frames = np.asarray(user_frames, dtype=np.float32)
+    start = routine.first_frame if first_frame is None else first_frame
+    offset = max(0, start - routine.first_frame)
+    count = max(0, min(len(user_frames), len(routine) - offset))
+
+    scores = np.zeros(len(user_frames), dtype=np.float32)
+    if count:
+        scores[:count] = score_frames(
+            user_frames[:count], routine.landmarks[offset:offset + count], distance_threshold, weights
+        )
+    return scores
+
+
+def main():
+    from app.services.reference_store import open_routine
+
+    parser = argparse.ArgumentParser(description="Score recorded user landmarks against a reference workout")
+    parser.add_argument("recording", help=".npy file of (frames, 33, 3+) user landmarks")
+    parser.add_argument("routine", help="reference workout name")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_DISTANCE_THRESHOLD,
+        help="largest matching landmark distance, in normalized frame units",
+    )
+    parser.add_argument("--weights", choices=sorted(WEIGHT_PRESETS), default="uniform")
+    args = parser.parse_args()
+
+    scores = score_recording(np.load(args.recording), open_routine(args.routine), args.threshold, WEIGHT_PRESETS[args.weights])
+    print(f"frames: {len(scores)}  mean accuracy: {scores.mean():.1f}%  min: {scores.min():.1f}%  max: {scores.max():.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import numpy as np
+from app.core.config import DTW_AHEAD, DTW_BEHIND, DTW_MAX_STEP
+
+
+def frame_distances(user, reference_frames):
+    """Mean landmark distance between one user frame and each reference frame.
+
+    Landmarks that are NaN on either side are ignored; a reference frame
+    with nothing to compare gets an infinite distance.
+    """
+    dims = min(user.shape[-1], reference_frames.shape[-1], 3)
+    diff = np.asarray(reference_frames[..., :dims], dtype=np.float32) - user[None, :, :dims]
+    distances = np.sqrt(np.sum(diff ** 2, axis=-1))  # (frames, 33)
+    valid = ~np.isnan(distances)
+    counts = valid.sum(axis=1)
+    totals = np.where(valid, distances, 0).sum(axis=1)
+    return np.divide(totals, counts, out=np.full(len(counts), np.inf), where=counts > 0)
+
+
+class IncrementalDTW:
+    """Online, band-limited dynamic time warping against a reference sequence.
+
+    Each user frame advances the alignment by 0 to `max_step` reference
+    frames (covering a user slower or faster than the reference, and
+    dropped frames). Only the accumulated costs for the band
+    [position - behind, position + ahead] are kept, so memory and work per
+    frame stay constant whatever the reference length. With `loop=True`
+    the reference repeats, as for a trainer video played on a loop.
+    """
+
+    def __init__(self, reference, ahead=DTW_AHEAD, behind=DTW_BEHIND, max_step=DTW_MAX_STEP, loop=False):
+        self.reference = reference  # (frames, 33, dims); may be a memmap
+        self.ahead = ahead
+        self.behind = behind
+        self.max_step = max_step
+        self.loop = loop
+        self.position = 0  # unwrapped reference position of the current best match
+        self._lo = 0
+        self._cost = None  # accumulated cost for positions [_lo, _lo + len(_cost))
+
+    @property
+    def index(self):
+        """Reference frame index of the current best match."""
+        return self.position % len(self.reference) if self.loop else self.position
+
+    def _band(self):
+        lo = max(0, self.position - self.behind)
+        hi = self.position + self.ahead + 1
+        if not self.loop:
+            hi = min(hi, len(self.reference))
+        return lo, hi
+
+    def _reference_frames(self, lo, hi):
+        if not self.loop:
+            return self.reference[lo:hi]
+        return self.reference[np.arange(lo, hi) % len(self.reference)]
+
+    def update(self, user_landmarks):
+        """Align one user frame; returns the matching reference frame index."""
+        lo, hi = self._band()
+        local = frame_distances(np.asarray(user_landmarks, dtype=np.float32), self._reference_frames(lo, hi))
+        missing = ~np.isfinite(local)
+        if missing.all():
+            # Nothing comparable in the band (e.g. a long reference gap); hold position
+            return self.index
+        # Reference frames without a pose can be passed through, but never preferred
+        local[missing] = local[~missing].max()
+
+        if self._cost is None:
+            # Open beginning: the user may start anywhere in the first band
+            cost = local
+        else:
+            # Previous costs shifted into the new band, padded with inf where they weren't tracked
+            previous = np.full(hi - lo + self.max_step, np.inf)
+            start = self._lo - lo + self.max_step
+            src_lo = max(0, -start)
+            src_hi = min(len(self._cost), len(previous) - start)
+            if src_hi > src_lo:
+                previous[start + src_lo:start + src_hi] = self._cost[src_lo:src_hi]
+            # Best predecessor 0..max_step reference frames back
+            best = previous[self.max_step:].copy()
+            for step in range(1, self.max_step + 1):
+                np.minimum(best, previous[self.max_step - step:len(previous) - step], out=best)
+            cost = local + best
+
+        # Shift so costs stay bounded over long sessions; argmin is unaffected
+        cost = cost - cost[np.isfinite(cost)].min()
+        self._lo = lo
+        self._cost = cost
+        self.position = lo + int(np.argmin(cost))
+        return self.index
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter, Form
+from fastapi import FastAPI, Depends, HTTPException, status, APIRouter, Form, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from passlib.context import CryptContext
@@ -10,6 +10,12 @@ from dotenv import load_dotenv
 import aiosmtplib 
 from email.message import EmailMessage
 import random
+import hashlib
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from app.core.config import LEADERBOARD_PAGE_SIZE, LEADERBOARD_MAX_PAGE_SIZE, LEADERBOARD_CACHE_TTL
 
 load_dotenv()
 
@@ -104,12 +110,92 @@ async def register(user: User):
     })
     return {"message": "User registered successfully."}
 
+# Leaderboard order; served straight from the matching index (_id breaks ties)
+LEADERBOARD_SORT = [("totalScore", DESCENDING), ("_id", ASCENDING)]
+# Only public fields ever leave the database (no password hashes or OTPs)
+LEADERBOARD_PROJECTION = {"username": 1, "totalScore": 1}
+
+# limit -> (expires_at, response) for the first page
+_leaderboard_cache = {}
+
+
+async def ensure_indexes():
+    """Create the indexes the auth routes query on (no-op when they already exist)."""
+    await users_collection.create_index(LEADERBOARD_SORT, name="leaderboard")
+
+
+def encode_cursor(entry):
+    return f"{entry['totalScore']}:{entry['id']}:{entry['rank']}"
+
+
+def decode_cursor(cursor):
+    try:
+        score, last_id, rank = cursor.split(":")
+        return int(score), ObjectId(last_id), int(rank)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def leaderboard_page(limit, cursor=None):
+    """One page of the leaderboard, continuing after `cursor` (keyset pagination)."""
+    query = {}
+    rank = 0
+    if cursor:
+        score, last_id, rank = decode_cursor(cursor)
+        query = {"$or": [
+            {"totalScore": {"$lt": score}},
+            {"totalScore": score, "_id": {"$gt": last_id}},
+        ]}
+
+    docs = await users_collection.find(query, LEADERBOARD_PROJECTION).sort(LEADERBOARD_SORT).limit(limit).to_list(limit)
+    entries = []
+    for doc in docs:
+        rank += 1
+        entries.append({"id": str(doc["_id"]), "username": doc.get("username"), "totalScore": doc.get("totalScore", 0), "rank": rank})
+
+    next_cursor = encode_cursor(entries[-1]) if len(entries) == limit else None
+    return {"leaderboard": entries, "next_cursor": next_cursor}
+
+
 @router.get("/leaderBoard")
-async def leaders(user:User):
-    user_list = await users_collection.find().sort("score", -1).to_list(None) 
-    if not user_list:
+async def leaders(limit: int = Query(LEADERBOARD_PAGE_SIZE, ge=1, le=LEADERBOARD_MAX_PAGE_SIZE), cursor: str = None):
+    if cursor:
+        return await leaderboard_page(limit, cursor)
+
+    # The top page is what nearly everyone asks for; serve it from memory for a few seconds
+    cached = _leaderboard_cache.get(limit)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    page = await leaderboard_page(limit)
+    if not page["leaderboard"]:
         raise HTTPException(status_code=404, detail="No users found")
-    return {"leaderboard": user_list}
+    _leaderboard_cache[limit] = (time.monotonic() + LEADERBOARD_CACHE_TTL, page)
+    return page
+
+
+def get_current_email(token: str = Depends(oauth2_scheme)):
+    """Email (the token subject) of the logged-in user."""
+    try:
+        email = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        email = None
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    return email
+
+
+@router.get("/leaderBoard/me")
+async def my_rank(email: str = Depends(get_current_email)):
+    user = await users_collection.find_one({"email": email}, LEADERBOARD_PROJECTION)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    score = user.get("totalScore", 0)
+    # Counted on the leaderboard index, with the same tie-break as the pages
+    ahead = await users_collection.count_documents({"$or": [
+        {"totalScore": {"$gt": score}},
+        {"totalScore": score, "_id": {"$lt": user["_id"]}},
+    ]})
+    return {"id": str(user["_id"]), "username": user.get("username"), "totalScore": score, "rank": ahead + 1}
 
 @router.post("/token", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -176,29 +262,26 @@ exercises = [
     { "name": "Push-ups", "reps": 70, "points": 70 }
 ]
 
-def getDailyChallenge():
-    return random.choice(exercises)
+def get_daily_challenge(user_id, day=None):
+    """Today's (or `day`'s) challenge for a user, derived from a stable hash of user id and date.
+
+    Every process computes the same answer, so nothing has to be written
+    when the day rolls over.
+    """
+    day = day or datetime.utcnow().date()
+    digest = hashlib.sha256(f"{user_id}:{day.isoformat()}".encode()).digest()
+    return exercises[int.from_bytes(digest[:8], "big") % len(exercises)]
 
 @router.get("/update-daily-challenge")
 async def update_daily_challenge():
-    users= await users_collection.find().to_list(None)
-
-    if not users:
-        raise HTTPException(status_code=404,detail="No users found in the database")
-
-    for user in users:
-        new_challenge=get_daily_challenge()
-        await users_collection.update_one(
-            {"_id":user["_id"]},
-            {"&set":{"daily_challenge":new_challenge}}
-        )
-    return {"message":"Daily challenge updated for all users!"}
+    # Challenges are derived on demand (see get_daily_challenge); kept for existing callers
+    return {"message": "Daily challenges are assigned automatically", "date": datetime.utcnow().date().isoformat()}
 
 
 @router.get("/send-challenge")
-async def send_otp(request : EmailSchema):
-    user= await users_collection.find_one({"email":request.email})
+async def send_challenge(request : EmailSchema):
+    user= await users_collection.find_one({"email":request.email}, {"_id": 1})
     if not user:
         raise HTTPException(status_code=404,detail="email not registered")
     
-    return {"daily-challenge":user.daily_challenge}
\ No newline at end of file
+    return {"daily-challenge":get_daily_challenge(user["_id"])}
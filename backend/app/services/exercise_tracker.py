@@ -6,45 +6,120 @@ import asyncio
 import websockets
 import base64
 import json
+from app.services.landmarks import from_pose_results, to_pixels, joint_angles
+from app.services.pose_profiles import make_pose
+
+# (a, b, c) landmark triplets whose angle at b each exercise needs
+PLANK_JOINTS = [(12, 24, 28)]                 # shoulder-hip-ankle
+SQUAT_JOINTS = [(24, 26, 28), (12, 24, 26)]   # hip-knee-ankle, shoulder-hip-knee
+PUSHUP_JOINTS = [(12, 14, 16), (12, 24, 28)]  # shoulder-elbow-wrist, shoulder-hip-ankle
+JUMPING_JACK_JOINTS = [(15, 11, 16)]          # left wrist-left shoulder-right wrist
+
+# Rep thresholds in degrees; a rep starts past the first and only completes past the second
+SQUAT_DOWN_ANGLE, SQUAT_UP_ANGLE = 85, 150        # knee angle
+PUSHUP_DOWN_ANGLE, PUSHUP_UP_ANGLE = 50, 160      # elbow angle
+JUMPING_JACK_OPEN_ANGLE, JUMPING_JACK_CLOSED_ANGLE = 140, 50  # arm spread
+# Body counts as straight for push-ups above the first angle and stops only below the second
+PUSHUP_STRAIGHT_ANGLE, PUSHUP_SAGGING_ANGLE = 160, 150
+
+
+class Hysteresis:
+    """Boolean latch that switches on past `on` and only switches off again past `off`.
+
+    `on` > `off` latches on rising values, `on` < `off` on falling ones.
+    Values between the two thresholds never change state, so jitter around
+    either threshold cannot double count or cancel a rep.
+    """
+
+    def __init__(self, on, off):
+        self.on = on
+        self.off = off
+        self.rising = on > off
+        self.active = False
+
+    def update(self, value):
+        """Feed one value; returns True on the update that switches the latch off (one full cycle)."""
+        if not self.active:
+            self.active = bool(value > self.on if self.rising else value < self.on)
+            return False
+        if value < self.off if self.rising else value > self.off:
+            self.active = False
+            return True
+        return False
+
+
+# Exercise name -> tracker function called as fn(tracker, lmList, target)
+EXERCISE_REGISTRY = {}
+
+def register_exercise(name):
+    """Register a tracker function so sessions can select it by name."""
+    def decorator(fn):
+        EXERCISE_REGISTRY[name] = fn
+        return fn
+    return decorator
 
 class ExerciseTracker:
-    def __init__(self):
-        self.pose = mp.solutions.pose.Pose()
+    def __init__(self, pose=None, exercise=None, render=True):
+        self.pose = pose  # only process_frame uses it; websocket sessions infer through the inference service
         self.mpDraw = mp.solutions.drawing_utils
+        self.render = render  # False skips all drawing when only feedback JSON is needed
         self.start_time = None
         self.holding_time = 0
+        self.frame_time = 0.0  # session time (seconds) of the frame being tracked
         self.rep_count = {"squat": 0, "pushup": 0, "jumping_jack": 0}
-        self.exercise_state = {"squat": False, "pushup": False, "jumping_jack": False}
+        self.exercise_state = {
+            "squat": Hysteresis(SQUAT_DOWN_ANGLE, SQUAT_UP_ANGLE),
+            "pushup": Hysteresis(PUSHUP_DOWN_ANGLE, PUSHUP_UP_ANGLE),
+            "jumping_jack": Hysteresis(JUMPING_JACK_OPEN_ANGLE, JUMPING_JACK_CLOSED_ANGLE),
+        }
+        self.pushup_body = Hysteresis(PUSHUP_STRAIGHT_ANGLE, PUSHUP_SAGGING_ANGLE)
+        self.pushup_completed = False  # a rep was just finished and the next one hasn't started
+        self.exercise = None
+        if exercise is not None:
+            self.set_exercise(exercise)
+
+    def set_exercise(self, exercise):
+        """Restrict tracking to a single registered exercise."""
+        if exercise not in EXERCISE_REGISTRY:
+            raise ValueError(f"Unknown exercise: {exercise}")
+        self.exercise = exercise
 
     def find_angle(self, a, b, c):
         """Calculate the angle between three points."""
-        ang = np.degrees(
-            np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        )
-        return abs(ang) if abs(ang) < 180 else 360 - abs(ang)
+        return joint_angles(np.array([a, b, c], dtype=np.float32), [(0, 1, 2)])[0]
 
     def process_frame(self, img):
         """Process frame and detect landmarks."""
+        if self.pose is None:
+            self.pose = make_pose()
         imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         results = self.pose.process(imgRGB)
-        lmList = []
+        lmList = to_pixels(from_pose_results(results), img.shape)
 
-        if results.pose_landmarks:
-            h, w, _ = img.shape
-            for lm in results.pose_landmarks.landmark:
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                lmList.append((cx, cy))
+        if self.render and results.pose_landmarks:
             self.mpDraw.draw_landmarks(img, results.pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS)
 
         return img, lmList
 
+    def draw_skeleton(self, img, lmList):
+        """Draw pixel landmarks and pose connections onto img (only in render mode)."""
+        if not self.render or len(lmList) == 0:
+            return img
+        points = lmList.astype(int)
+        for start, end in mp.solutions.pose.POSE_CONNECTIONS:
+            cv2.line(img, tuple(points[start]), tuple(points[end]), (255, 255, 255), 2)
+        for x, y in points:
+            cv2.circle(img, (x, y), 4, (0, 0, 255), cv2.FILLED)
+        return img
+
+    @register_exercise("plank")
     def track_plank(self, lmList, target=None):
         """Check if the user is in a correct plank position."""
         if len(lmList) < 27:
             return {"plank": "False", "time_held": 0}
 
         shoulder, hip, ankle = lmList[12], lmList[24], lmList[28]
-        angle = self.find_angle(shoulder, hip, ankle)
+        angle, = joint_angles(lmList, PLANK_JOINTS)
 
         shoulder_hip_diff = abs(shoulder[1] - hip[1])  
         hip_ankle_diff = abs(hip[1] - ankle[1])
@@ -52,8 +127,8 @@ class ExerciseTracker:
 
         if shoulder_hip_diff < 50 and hip_ankle_diff < 50 and 160 <= angle <= 180:
             if self.start_time is None:
-                self.start_time = time.time()
-            self.holding_time = int(time.time() - self.start_time)
+                self.start_time = self.frame_time
+            self.holding_time = int(self.frame_time - self.start_time)
 
             plank_message ="Keep trying"
             if target is not None and self.holding_time is not None and self.holding_time>=target:
@@ -71,19 +146,14 @@ class ExerciseTracker:
             return {"plank": False, "time_held": 0}
 
 
+    @register_exercise("squat")
     def track_squat(self, lmList, target=None):
         """Count squat repetitions and provide feedback on posture and movement."""
         if len(lmList) < 27:
             return {"squat_reps": self.rep_count["squat"], "squat_message": "Landmarks missing", "correct_squat": False, "posture": "N/A"}
 
-        # Get keypoints
-        shoulder, hip, knee, ankle = lmList[12], lmList[24], lmList[26], lmList[28]
-    
-        # Calculate angles
-        squat_angle = self.find_angle(hip, knee, ankle)  # Angle of knee during squat
-        torso_angle = self.find_angle(shoulder, hip, knee)  # Angle of torso
-
-        print(f"Squat Angle: {squat_angle}, Torso Angle: {torso_angle}")
+        # Calculate knee angle (depth) and torso angle in one pass
+        squat_angle, torso_angle = joint_angles(lmList, SQUAT_JOINTS)
 
         # Provide posture feedback
         if torso_angle > 95:
@@ -93,9 +163,13 @@ class ExerciseTracker:
         else:
             posture = "Good posture"
 
-        # Detect if the person is standing (Torso angle near 180°)
-        if torso_angle > 170 and squat_angle > 150:  # Torso angle close to upright and knees straight
-            self.exercise_state["squat"] = False  # The person is standing, so no squat in progress
+        # Count squat reps based on knee angle (squat down and stand up logic)
+        state = self.exercise_state["squat"]
+        if state.update(squat_angle):
+            self.rep_count["squat"] += 1
+
+        # Detect if the person is just standing (torso upright, knees straight, no squat in progress)
+        elif not state.active and torso_angle > 170 and squat_angle > SQUAT_UP_ANGLE:
             return {
                 "squat_reps": self.rep_count["squat"],
                 "squat_message": "Not a squat. Keep your body straight.",
@@ -103,16 +177,9 @@ class ExerciseTracker:
                 "posture": posture
             }
 
-        # Count squat reps based on knee angle (squat down and stand up logic)
-        if squat_angle < 85:  # Going down (squat)
-            self.exercise_state["squat"] = True
-        elif self.exercise_state["squat"] and squat_angle > 150:  # Coming up (standing)
-            self.rep_count["squat"] += 1
-            self.exercise_state["squat"] = False
-
         # Provide squat progress messages
         squat_message = "Don't loosen your body"
-        if self.rep_count["squat"]>=target:
+        if target is not None and self.rep_count["squat"]>=target:
             return {"challenge-completed":bool(True)}
         elif self.rep_count["squat"] < 5:
             squat_message = "Keep going! Squats in progress 💪"
@@ -122,74 +189,72 @@ class ExerciseTracker:
         return {
             "squat_reps": self.rep_count["squat"],
             "squat_message": squat_message,
-            "correct_squat": squat_angle < 90,  # Check if squat angle is below 90 degrees for correct form
+            "correct_squat": bool(squat_angle < 90),  # Check if squat angle is below 90 degrees for correct form
             "posture": posture  # Feedback on posture
         }
 
+    @register_exercise("pushup")
     def track_pushup(self, lmList, target=None):
         """Accurately count push-up reps by ensuring correct posture and movement, only when leaning."""
         if len(lmList) < 29:  
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Not enough landmarks detected"}
 
-        shoulder, elbow, wrist = lmList[12], lmList[14], lmList[16]
-        hip, knee, ankle = lmList[24], lmList[26], lmList[28]
+        # Arm movement and body straightness
+        pushup_angle, body_angle = joint_angles(lmList, PUSHUP_JOINTS)
 
-        pushup_angle = self.find_angle(shoulder, elbow, wrist)  # Arm movement
-        body_angle = self.find_angle(shoulder, hip, ankle)  # Ensur`e body is straight
-
-        print(f"Push-up angle: {pushup_angle}, Body angle: {body_angle}")
-
-        if body_angle > 160:  # If body angle is too upright, they are standing
+        # A vertical shoulder-hip line means they are standing, not leaning into a push-up
+        shoulder, hip = lmList[12], lmList[24]
+        if abs(shoulder[1] - hip[1]) > abs(shoulder[0] - hip[0]):
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Please get into a proper push-up position (leaning)"}
 
-        if body_angle < 160:  
+        # The body must straighten past 160° and only counts as sagging again below 150°
+        self.pushup_body.update(body_angle)
+        if not self.pushup_body.active:
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Keep your body straight"}
 
-        if pushup_angle < 50:  # Going down (arm angle is smaller)
-            self.exercise_state["pushup"] = "down"  # Mark the state as going down
-
-        elif self.exercise_state["pushup"] == "down" and pushup_angle > 160:  # Coming up (arm angle is larger)
-            self.rep_count["pushup"] += 1  # Increment rep count
-            self.exercise_state["pushup"] = "up"  # Mark the state as coming up
-
-        # Reset after completing a rep (ensure the next push-up starts fresh)
-        elif self.exercise_state["pushup"] == "up" and pushup_angle < 150:
-            self.exercise_state["pushup"] = "reset"  # Reset to wait for the next rep
+        # Going down below 50° starts a rep; coming back up past 160° completes it
+        state = self.exercise_state["pushup"]
+        if state.update(pushup_angle):
+            self.rep_count["pushup"] += 1
+            self.pushup_completed = True
+        elif state.active:
+            self.pushup_completed = False
 
-        # Step 4: Message feedback based on form
-        if body_angle > 160:
-            return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Please get into a proper push-up position (leaning)"}
-        elif self.exercise_state["pushup"] == "down":
+        # Message feedback based on where they are in the rep
+        if state.active:
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Going down, keep going!"}
-        elif self.exercise_state["pushup"] == "up":
+        elif self.pushup_completed:
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Great job! Coming up!"}
         else:
             return {"pushup_reps": self.rep_count["pushup"], "pushup_message": "Good form! Keep going!"}
 
 
-    def track_jumping_jack(self, lmList):
+    @register_exercise("jumping_jack")
+    def track_jumping_jack(self, lmList, target=None):
         """Count jumping jack repetitions."""
         if len(lmList) < 17:
             return {"jumping_jack_reps": self.rep_count["jumping_jack"]}
 
-        wrist_left, wrist_right, shoulder_left, shoulder_right = (
-            lmList[15], lmList[16], lmList[11], lmList[12])
-        arm_angle = self.find_angle(wrist_left, shoulder_left, wrist_right)
+        arm_angle, = joint_angles(lmList, JUMPING_JACK_JOINTS)
 
-        if arm_angle > 140:
-            self.exercise_state["jumping_jack"] = True
-        elif self.exercise_state["jumping_jack"] and arm_angle < 50:
+        # Arms open past 140° then closed below 50° is one rep
+        if self.exercise_state["jumping_jack"].update(arm_angle):
             self.rep_count["jumping_jack"] += 1
-            self.exercise_state["jumping_jack"] = False
 
         return {"jumping_jack_reps": self.rep_count["jumping_jack"]}
 
-    def track_exercises(self, img, lmList, target=None):
-        """Track all exercises and return feedback."""
+    def track_exercises(self, img, lmList, target=None, frame_time=None):
+        """Track the session's exercise, or every registered one if none was declared.
+
+        `frame_time` is the frame's time on the session timeline; hold
+        durations are measured on it. Without one the monotonic clock is used.
+        """
+        self.frame_time = time.monotonic() if frame_time is None else frame_time
+        if self.exercise is not None:
+            return EXERCISE_REGISTRY[self.exercise](self, lmList, target)
+
         feedback = {}
-        feedback.update(self.track_plank(lmList, target))
-        feedback.update(self.track_squat(lmList, target))
-        feedback.update(self.track_pushup(lmList, target))
-        feedback.update(self.track_jumping_jack(lmList))
+        for track in EXERCISE_REGISTRY.values():
+            feedback.update(track(self, lmList, target))
         return feedback
 
@@ -0,0 +1,193 @@
+"""Wire format for frames sent to /ws and /ws/workout.
+
+Binary messages carry a little-endian header followed by the raw JPEG/WebP
+bytes. Version 2 (18 bytes) adds the client capture timestamp to the
+10-byte version 1 header, which is still accepted:
+
+    offset  size  field
+    0       2     magic b"PF"
+    2       1     protocol version (1 or 2)
+    3       1     exercise code (see EXERCISE_CODES, 0 = not set)
+    4       2     target reps/seconds (0 = no target)
+    6       4     sequence number
+    10      8     capture timestamp in ms, float64, any origin (version 2 only)
+
+Clients that run pose estimation on the device send landmarks instead of an
+image (magic b"PL"), skipping decoding and inference on the server. The
+22-byte header is followed by 33 rows of little-endian float32 normalized
+x, y[, z[, visibility]]:
+
+    offset  size  field
+    0       2     magic b"PL"
+    2       1     protocol version (1)
+    3       1     exercise code
+    4       2     target reps/seconds
+    6       4     sequence number
+    10      8     capture timestamp in ms, float64
+    18      2     width of the frame the landmarks were found in, pixels
+    20      2     height of that frame, pixels
+
+Text messages keep the original formats as a fallback: a JSON object with a
+base64 "frame" field (and optional "timestamp" in ms), or (for /ws/workout)
+a bare base64 string. A JSON object may carry "landmarks" (33 lists of
+normalized [x, y, z, visibility]) with "width" and "height" instead of "frame".
+"""
+import base64
+import json
+import struct
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from app.services.landmarks import NUM_LANDMARKS
+
+MAGIC = b"PF"
+VERSION = 2
+HEADERS = {
+    1: struct.Struct("<2sBBHI"),
+    2: struct.Struct("<2sBBHId"),
+}
+HEADER = HEADERS[VERSION]
+HEADER_SIZE = HEADER.size
+
+LANDMARKS_MAGIC = b"PL"
+LANDMARKS_VERSION = 1
+LANDMARKS_HEADER = struct.Struct("<2sBBHIdHH")
+
+EXERCISE_CODES = {
+    0: None,
+    1: "plank",
+    2: "squat",
+    3: "pushup",
+    4: "jumping_jack",
+}
+EXERCISE_IDS = {name: code for code, name in EXERCISE_CODES.items()}
+
+
+class FrameMessage:
+    """One frame received from a client, whichever format it arrived in."""
+
+    def __init__(self, frame, exercise=None, target=None, seq=None, binary=False, timestamp=None, landmarks=None, size=None):
+        self.frame = frame  # uint8 array of encoded image bytes, None for landmark messages
+        self.exercise = exercise
+        self.target = target
+        self.seq = seq
+        self.binary = binary
+        self.timestamp = timestamp  # client capture time in ms, None if the client didn't send one
+        self.landmarks = landmarks  # (33, 4) normalized landmarks computed on the client, or None
+        self.size = size  # (height, width) of the client's frame for landmark messages
+
+
+def to_landmark_array(values):
+    """Validate client landmarks into a (33, 4) float32 array; visibility defaults to 1."""
+    values = np.asarray(values, dtype=np.float32)
+    if values.ndim != 2 or values.shape[0] != NUM_LANDMARKS or not 2 <= values.shape[1] <= 4:
+        raise ValueError(f"Expected {NUM_LANDMARKS} landmarks of 2 to 4 values")
+    if not np.isfinite(values).all():
+        raise ValueError("Landmarks must be finite numbers")
+    landmarks = np.ones((NUM_LANDMARKS, 4), dtype=np.float32)
+    landmarks[:, 2] = 0
+    landmarks[:, :values.shape[1]] = values
+    return landmarks
+
+
+def check_size(width, height):
+    """(height, width) of the client's frame, which trackers need to work in pixels."""
+    try:
+        width, height = int(width), int(height)
+    except (TypeError, ValueError):
+        width = height = 0
+    if width <= 0 or height <= 0:
+        raise ValueError("Landmark messages need the frame width and height")
+    return height, width
+
+
+def encode_frame(image_bytes, exercise=None, target=None, seq=0, timestamp=None):
+    """Build a binary frame message (used by clients and the benchmarks)."""
+    if timestamp is None:
+        header = HEADERS[1].pack(MAGIC, 1, EXERCISE_IDS.get(exercise, 0), target or 0, seq)
+    else:
+        header = HEADER.pack(MAGIC, VERSION, EXERCISE_IDS.get(exercise, 0), target or 0, seq, timestamp)
+    return header + bytes(image_bytes)
+
+
+def encode_landmarks(landmarks, width, height, exercise=None, target=None, seq=0, timestamp=0.0):
+    """Build a binary landmark message from a (33, 2-4) normalized landmark array."""
+    header = LANDMARKS_HEADER.pack(
+        LANDMARKS_MAGIC, LANDMARKS_VERSION, EXERCISE_IDS.get(exercise, 0), target or 0, seq, timestamp, width, height
+    )
+    return header + np.ascontiguousarray(landmarks, dtype="<f4").tobytes()
+
+
+def parse_binary_landmarks(data):
+    if len(data) < LANDMARKS_HEADER.size:
+        raise ValueError("Landmark message is shorter than its header")
+    _, version, exercise, target, seq, timestamp, width, height = LANDMARKS_HEADER.unpack_from(data)
+    if version != LANDMARKS_VERSION:
+        raise ValueError("Unknown landmark message version")
+    if exercise not in EXERCISE_CODES:
+        raise ValueError(f"Unknown exercise code {exercise}")
+    payload = len(data) - LANDMARKS_HEADER.size
+    if payload % (NUM_LANDMARKS * 4):
+        raise ValueError("Landmark payload is not a whole number of float32 rows")
+    values = np.frombuffer(data, "<f4", offset=LANDMARKS_HEADER.size).reshape(NUM_LANDMARKS, -1)
+    return FrameMessage(
+        None, EXERCISE_CODES[exercise], target or None, seq, binary=True, timestamp=timestamp,
+        landmarks=to_landmark_array(values), size=check_size(width, height),
+    )
+
+
+def parse_binary(data):
+    if data[:2] == LANDMARKS_MAGIC:
+        return parse_binary_landmarks(data)
+    if len(data) < 3 or data[:2] != MAGIC or data[2] not in HEADERS:
+        raise ValueError("Unknown binary frame format")
+    header = HEADERS[data[2]]
+    if len(data) < header.size:
+        raise ValueError("Binary frame is shorter than its header")
+    _, version, exercise, target, seq, *timestamp = header.unpack_from(data)
+    if exercise not in EXERCISE_CODES:
+        raise ValueError(f"Unknown exercise code {exercise}")
+    # View the image bytes in place; cv2.imdecode reads straight from the receive buffer
+    frame = np.frombuffer(data, np.uint8, offset=header.size)
+    return FrameMessage(frame, EXERCISE_CODES[exercise], target or None, seq, binary=True, timestamp=timestamp[0] if timestamp else None)
+
+
+def parse_text(text):
+    if text.lstrip().startswith("{"):
+        parsed_data = json.loads(text)
+        seq = parsed_data.get("seq", parsed_data.get("frame_No"))
+        if parsed_data.get("landmarks") is not None:
+            return FrameMessage(
+                None,
+                parsed_data.get("exercise"),
+                parsed_data.get("target", None),
+                seq,
+                timestamp=parsed_data.get("timestamp"),
+                landmarks=to_landmark_array(parsed_data["landmarks"]),
+                size=check_size(parsed_data.get("width"), parsed_data.get("height")),
+            )
+        frame_data = parsed_data.get("frame")
+        if frame_data is None:
+            raise ValueError("Message has no frame")
+        return FrameMessage(
+            np.frombuffer(base64.b64decode(frame_data), np.uint8),
+            parsed_data.get("exercise"),
+            parsed_data.get("target", None),
+            seq,
+            timestamp=parsed_data.get("timestamp"),
+        )
+    return FrameMessage(np.frombuffer(base64.b64decode(text), np.uint8))
+
+
+def parse_message(message):
+    """Turn a raw websocket message into a FrameMessage, whichever format it uses."""
+    if message.get("bytes") is not None:
+        return parse_binary(message["bytes"])
+    return parse_text(message["text"])
+
+
+async def receive_message(websocket: WebSocket):
+    """Wait for the next text or binary message, raising WebSocketDisconnect on close."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message
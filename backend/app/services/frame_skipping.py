@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+from app.core.config import INFER_EVERY_N_FRAMES, SKIP_MOTION_THRESHOLD, SKIP_MAX_EXTRAPOLATION
+
+# Size of the grey thumbnail used for the motion check
+THUMBNAIL_SIZE = (64, 48)
+
+
+class FrameSkipper:
+    """Decides which frames of a session need pose inference and estimates the rest.
+
+    Inference runs on every `every`-th frame, and earlier whenever the
+    downsampled frame has changed more than `motion_threshold` since the
+    last inferred one. In between, landmarks are extrapolated linearly from
+    the last two inferred frames (the stream is live, so there is no later
+    keyframe to interpolate towards), for at most `max_extrapolation` seconds.
+    """
+
+    def __init__(self, every=INFER_EVERY_N_FRAMES, motion_threshold=SKIP_MOTION_THRESHOLD, max_extrapolation=SKIP_MAX_EXTRAPOLATION):
+        self.every = max(1, every)
+        self.motion_threshold = motion_threshold
+        self.max_extrapolation = max_extrapolation
+        self.inferred = 0
+        self.skipped = 0
+        self.reset()
+
+    def reset(self):
+        self._since_keyframe = 0
+        self._thumbnail = None
+        self._candidate = None
+        self._landmarks = None
+        self._timestamp = None
+        self._velocity = None
+
+    @property
+    def enabled(self):
+        return self.every > 1
+
+    def _thumbnail_of(self, img):
+        small = cv2.resize(img, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def needs_inference(self, img):
+        """True if `img` has to go through pose inference."""
+        if not self.enabled or img is None:
+            return True
+        self._candidate = self._thumbnail_of(img)
+        if self._landmarks is None or self._since_keyframe + 1 >= self.every:
+            return True
+        motion = np.abs(self._candidate - self._thumbnail).mean()
+        return motion > self.motion_threshold
+
+    def keyframe(self, landmarks, timestamp):
+        """Record the result of an inferred frame."""
+        self.inferred += 1
+        if not self.enabled:
+            return
+        if landmarks is not None and self._landmarks is not None and timestamp > self._timestamp:
+            self._velocity = (landmarks - self._landmarks) / (timestamp - self._timestamp)
+            # Visibility is carried over, not extrapolated
+            self._velocity[:, 3] = 0
+        else:
+            self._velocity = None
+        self._landmarks = landmarks
+        self._timestamp = timestamp
+        self._thumbnail = self._candidate
+        self._since_keyframe = 0
+
+    def estimate(self, timestamp):
+        """Landmarks for a skipped frame, extrapolated from the last keyframes."""
+        self.skipped += 1
+        self._since_keyframe += 1
+        if self._velocity is None:
+            return self._landmarks.copy()
+        elapsed = min(max(timestamp - self._timestamp, 0), self.max_extrapolation)
+        return self._landmarks + self._velocity * elapsed
@@ -0,0 +1,430 @@
+import asyncio
+import itertools
+import multiprocessing
+import threading
+import time
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+from app.services.landmarks import from_pose_results
+from app.services.preprocess import FramePreprocessor
+from app.services.pose_profiles import make_pose, LoadShedPolicy, LITE_PROFILE
+from app.core.config import (
+    INFERENCE_WORKERS, INFERENCE_MAX_FRAME_BYTES, INFERENCE_TIMEOUT, POSE_POOL_SIZE, DEFAULT_POSE_PROFILE,
+    INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS,
+)
+
+# Weight of each new frame in the queueing delay average that drives load shedding
+QUEUE_DELAY_SMOOTHING = 0.2
+
+# Sent by a worker once its graphs are built, before it takes any frames
+READY = "ready"
+# Seconds to wait for a worker to import MediaPipe and build its graphs
+WORKER_START_TIMEOUT = 120
+
+
+def _worker_main(conn, slot_names):
+    """Worker process: owns the Pose graphs for its slots and answers batches of frame requests."""
+    buffers = {slot: shared_memory.SharedMemory(name=name) for slot, name in slot_names.items()}
+    # One graph per (slot, profile); the default and lite graphs are warmed up front
+    # so load shedding never has to build a graph while the box is saturated
+    graphs = {
+        (slot, profile): make_pose(profile)
+        for slot in slot_names
+        for profile in {DEFAULT_POSE_PROFILE, LITE_PROFILE}
+    }
+    last_graph = {}  # slot -> graph that ran the slot's previous frame
+    conn.send(READY)
+
+    try:
+        while True:
+            batch = conn.recv()
+            if batch is None:
+                break
+
+            # Each frame belongs to a different session's graph, so they run one after the
+            # other, but the whole batch costs one message each way
+            replies = []
+            for request_id, slot, shape, profile, reset in batch:
+                started = time.perf_counter()
+                try:
+                    frame = np.ndarray(shape, dtype=np.uint8, buffer=buffers[slot].buf)
+                    graph = graphs.get((slot, profile))
+                    if graph is None:
+                        graph = graphs[(slot, profile)] = make_pose(profile)
+                    # Tracking and smoothing state is only valid for the crop (and graph) it came from
+                    if reset or last_graph.get(slot) is not graph:
+                        graph.reset()
+                    last_graph[slot] = graph
+                    results = graph.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    replies.append((request_id, from_pose_results(results), None, time.perf_counter() - started))
+                except Exception as e:
+                    replies.append((request_id, None, str(e), time.perf_counter() - started))
+            conn.send(replies)
+    finally:
+        for graph in graphs.values():
+            graph.close()
+        for shm in buffers.values():
+            shm.close()
+
+
+class RemotePose:
+    """Handle to one Pose graph living in a worker process.
+
+    A handle is leased to a single session at a time, so its shared memory
+    slot only ever holds one in-flight frame. Frames are cropped and
+    downscaled before they are sent to the worker.
+    """
+
+    def __init__(self, service, slot):
+        self.service = service
+        self.slot = slot
+        self.preprocessor = FramePreprocessor()
+        self.profile = DEFAULT_POSE_PROFILE
+        self.active_profile = self.profile  # what was actually used, after load shedding
+
+    async def process(self, img):
+        """Run pose detection on a BGR frame; returns a (33, 4) array of x, y, z, visibility or None."""
+        if img is None:
+            raise ValueError("Could not decode frame")
+        small, box = await asyncio.to_thread(self.preprocessor.prepare, img)
+        self.active_profile = self.service.shed_policy.apply(self.profile, self.service.queue_delay_ms)
+        # A moved crop (or a new session) restarts the graph's tracking
+        landmarks = await self.service.infer(self.slot, small, self.active_profile, self.preprocessor.crop_changed)
+        return self.preprocessor.restore(landmarks, box)
+
+    def reset(self):
+        """Forget the previous session's region of interest and profile."""
+        self.preprocessor.reset()
+        self.profile = DEFAULT_POSE_PROFILE
+
+    def close(self):
+        pass
+
+
+class _Worker:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.reader = None
+        self.queue = []  # requests waiting to be sent as the next batch
+        self.in_flight = 0  # batches sent and not answered yet
+        self.flush_handle = None
+        self.loop = None
+        self.ready = threading.Event()
+
+
+class BatchStats:
+    """Counters behind the micro-batching metrics."""
+
+    def __init__(self):
+        self.batches = 0
+        self.frames = 0
+        self.sizes = {}  # batch size -> number of batches
+
+    def record(self, size):
+        self.batches += 1
+        self.frames += size
+        self.sizes[size] = self.sizes.get(size, 0) + 1
+
+    @property
+    def mean_size(self):
+        return self.frames / self.batches if self.batches else 0.0
+
+
+class InferenceService:
+    """Runs MediaPipe inference in worker processes so the event loop never blocks on it.
+
+    Frames from all sessions are micro-batched per worker: an idle worker
+    gets a frame straight away, while frames arriving for a busy worker are
+    collected (up to `max_batch`, for at most `max_wait_ms`) and sent as one
+    message, so IPC and wake-ups are paid per batch rather than per frame.
+    Each session has at most one frame in flight, so batches only form when
+    a worker serves several slots (`slots` > `workers`).
+    """
+
+    def __init__(
+        self, workers=INFERENCE_WORKERS, slots=POSE_POOL_SIZE, max_frame_bytes=INFERENCE_MAX_FRAME_BYTES,
+        max_batch=INFERENCE_MAX_BATCH, max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    ):
+        self.num_workers = max(1, workers)
+        self.num_slots = max(1, slots)
+        self.max_frame_bytes = max_frame_bytes
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatchStats()
+        self.workers = []
+        self.buffers = []
+        self._pending = {}
+        self._slot_requests = {}  # request id -> (slot, worker, enqueue time) for frames a worker may still be reading
+        self._slot_busy = {}  # slot -> future resolved once the worker is done with the slot's frame
+        self._request_ids = itertools.count()
+        self._next_slot = 0
+        self.queue_delay = 0.0  # moving average (seconds) of how long frames wait behind other frames
+        self.shed_policy = LoadShedPolicy()
+        self.restarts = 0
+        self._stopping = False
+
+    @property
+    def running(self):
+        return bool(self.workers)
+
+    @property
+    def load(self):
+        """In-flight frames per worker."""
+        return len(self._pending) / self.num_workers
+
+    @property
+    def queue_delay_ms(self):
+        return self.queue_delay * 1000
+
+    @property
+    def queue_depth(self):
+        """Frames waiting to be batched and sent to a worker."""
+        return sum(len(worker.queue) for worker in self.workers)
+
+    def metrics(self):
+        return {
+            "workers": self.num_workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": len(self._pending) - self.queue_depth,
+            "load": self.load,
+            "queue_delay_ms": self.queue_delay_ms,
+            "batches": self.stats.batches,
+            "frames": self.stats.frames,
+            "mean_batch_size": self.stats.mean_size,
+            "batch_sizes": dict(sorted(self.stats.sizes.items())),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "worker_restarts": self.restarts,
+        }
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping = False
+        self.buffers = [
+            shared_memory.SharedMemory(create=True, size=self.max_frame_bytes)
+            for _ in range(self.num_slots)
+        ]
+        workers = [self._spawn(index) for index in range(self.num_workers)]
+        # Wait for the graphs, so the first frames don't queue behind worker startup
+        # (and count as load) and the pool really is warm once startup finishes
+        for worker in workers:
+            self._wait_ready(worker)
+        self.workers = workers
+
+    def _wait_ready(self, worker):
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while not worker.ready.wait(0.1):
+            if not worker.process.is_alive():
+                raise RuntimeError(f"Inference worker {worker.index} exited during startup")
+            if time.monotonic() > deadline:
+                print(f"Inference worker {worker.index} not ready after {WORKER_START_TIMEOUT}s")
+                return
+
+    def _spawn(self, index):
+        """Start worker `index` on its share of the shared memory slots."""
+        ctx = multiprocessing.get_context("spawn")
+        # Slots are dealt round-robin so sessions spread evenly over the workers
+        slot_names = {
+            slot: self.buffers[slot].name
+            for slot in range(index, self.num_slots, self.num_workers)
+        }
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_worker_main, args=(child_conn, slot_names), daemon=True)
+        process.start()
+        child_conn.close()
+
+        worker = _Worker(index, process, parent_conn)
+        worker.reader = threading.Thread(target=self._read_results, args=(worker,), daemon=True)
+        worker.reader.start()
+        return worker
+
+    def stop(self):
+        self._stopping = True
+        for worker in self.workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        for shm in self.buffers:
+            shm.close()
+            shm.unlink()
+        self.workers = []
+        self.buffers = []
+        self._slot_requests = {}
+        self._slot_busy = {}
+        self._next_slot = 0
+
+    def create_estimator(self):
+        """Factory for PosePool: hands out one RemotePose per shared memory slot."""
+        if self._next_slot >= self.num_slots:
+            raise RuntimeError("No inference slots left")
+        estimator = RemotePose(self, self._next_slot)
+        self._next_slot += 1
+        return estimator
+
+    async def infer(self, slot, img, profile=DEFAULT_POSE_PROFILE, reset=False):
+        if img is None:
+            raise ValueError("Could not decode frame")
+        if img.nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame of {img.nbytes} bytes exceeds the {self.max_frame_bytes} byte limit")
+
+        # A frame that timed out may still be read by its worker; overwriting it now would tear it
+        busy = self._slot_busy.get(slot)
+        if busy is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(busy), INFERENCE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise RuntimeError("Inference worker is still busy with the previous frame")
+
+        view = np.ndarray(img.shape, dtype=np.uint8, buffer=self.buffers[slot].buf)
+        np.copyto(view, img)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = next(self._request_ids)
+        worker = self.workers[slot % self.num_workers]
+        self._pending[request_id] = (loop, future, worker)
+        self._slot_requests[request_id] = (slot, worker, loop.time())
+        self._slot_busy[slot] = loop.create_future()
+        request = (request_id, slot, img.shape, profile, reset)
+        self._enqueue(worker, request, loop)
+        try:
+            return await asyncio.wait_for(future, INFERENCE_TIMEOUT)
+        finally:
+            self._pending.pop(request_id, None)
+            if request in worker.queue:
+                # Never sent, so the worker won't read the slot
+                worker.queue.remove(request)
+                self._release_slot(request_id)
+
+    def _enqueue(self, worker, request, loop):
+        worker.loop = loop
+        worker.queue.append(request)
+        if worker.in_flight == 0 or len(worker.queue) >= self.max_batch:
+            self._flush(worker)
+        elif worker.flush_handle is None:
+            worker.flush_handle = loop.call_later(self.max_wait, self._flush, worker)
+
+    def _flush(self, worker):
+        """Send everything queued for `worker` as one batch."""
+        if worker.flush_handle is not None:
+            worker.flush_handle.cancel()
+            worker.flush_handle = None
+        if not worker.queue:
+            return
+        batch, worker.queue = worker.queue[:self.max_batch], worker.queue[self.max_batch:]
+        try:
+            with worker.send_lock:
+                worker.conn.send(batch)
+        except (BrokenPipeError, OSError) as e:
+            for request_id, *_ in batch:
+                pending = self._pending.get(request_id)
+                if pending:
+                    _resolve(pending[1], None, f"Inference worker unavailable: {e}")
+                self._release_slot(request_id)
+            return
+        worker.in_flight += 1
+        self.stats.record(len(batch))
+        if worker.queue:
+            worker.flush_handle = worker.loop.call_later(self.max_wait, self._flush, worker)
+
+    def _release_slot(self, request_id):
+        """The worker is done reading `request_id`'s frame, so its slot may take the next one."""
+        slot, _, _ = self._slot_requests.pop(request_id, (None, None, None))
+        busy = self._slot_busy.pop(slot, None)
+        if busy is not None and not busy.done():
+            busy.set_result(None)
+
+    def _worker_exited(self, worker):
+        if worker.flush_handle is not None:
+            worker.flush_handle.cancel()
+            worker.flush_handle = None
+        # Frames still queued for the dead worker were never sent
+        for request_id, *_ in worker.queue:
+            pending = self._pending.get(request_id)
+            if pending:
+                _resolve(pending[1], None, "Inference worker exited")
+        worker.queue = []
+        for request_id, (_, owner, _) in list(self._slot_requests.items()):
+            if owner is worker:
+                self._release_slot(request_id)
+
+    def _batch_done(self, worker, timings):
+        now = worker.loop.time()
+        for request_id, seconds in timings:
+            request = self._slot_requests.get(request_id)
+            if request is not None:
+                # Whatever the frame spent beyond its own inference was spent waiting for the worker
+                waited = max(0.0, now - request[2] - seconds)
+                self.queue_delay += QUEUE_DELAY_SMOOTHING * (waited - self.queue_delay)
+            self._release_slot(request_id)
+        worker.in_flight -= 1
+        # The worker is free again: whatever queued up meanwhile goes out now
+        if worker.in_flight == 0:
+            self._flush(worker)
+
+    def _read_results(self, worker):
+        """Reader thread: resolves the awaiting coroutine for every worker reply."""
+        while True:
+            try:
+                replies = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            if replies == READY:
+                worker.ready.set()
+                continue
+            for request_id, landmarks, error, _ in replies:
+                pending = self._pending.get(request_id)
+                if pending:
+                    loop, future, _ = pending
+                    loop.call_soon_threadsafe(_resolve, future, landmarks, error)
+            if worker.loop is not None:
+                timings = [(request_id, seconds) for request_id, _, _, seconds in replies]
+                worker.loop.call_soon_threadsafe(self._batch_done, worker, timings)
+
+        # The worker is gone: fail whatever was still waiting on it
+        for loop, future, owner in list(self._pending.values()):
+            if owner is worker:
+                loop.call_soon_threadsafe(_resolve, future, None, "Inference worker exited")
+        if worker.loop is not None:
+            worker.loop.call_soon_threadsafe(self._worker_exited, worker)
+
+        # Crashed (e.g. a MediaPipe segfault) rather than stopped: replace it on the same slots,
+        # so sessions holding those slots recover instead of failing every frame
+        if not self._stopping and worker.index < len(self.workers) and self.workers[worker.index] is worker:
+            worker.process.join()
+            worker.conn.close()
+            print(f"Inference worker {worker.index} exited with code {worker.process.exitcode}, restarting it")
+            self.restarts += 1
+            replacement = self._spawn(worker.index)
+            self._wait_ready(replacement)
+            self.workers[worker.index] = replacement
+
+
+def _resolve(future, landmarks, error):
+    if future.done():
+        return
+    if error:
+        future.set_exception(RuntimeError(error))
+    else:
+        future.set_result(landmarks)
+
+
+async def decode_frame(frame_bytes):
+    """Decode JPEG/PNG bytes on a thread so large frames don't stall the event loop."""
+    np_arr = np.frombuffer(frame_bytes, np.uint8)
+    return await asyncio.to_thread(cv2.imdecode, np_arr, cv2.IMREAD_COLOR)
+
+
+inference_service = InferenceService()
@@ -0,0 +1,59 @@
+import numpy as np
+
+NUM_LANDMARKS = 33
+
+# Columns of a landmark array
+X, Y, Z, VISIBILITY = range(4)
+
+# Row order of a landmark array (MediaPipe PoseLandmark order)
+LANDMARK_NAMES = [
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER",
+    "RIGHT_EYE_INNER", "RIGHT_EYE", "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR",
+    "MOUTH_LEFT", "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER",
+    "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST",
+    "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX",
+    "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP",
+    "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+    "LEFT_HEEL", "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+]
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARK_NAMES)}
+
+
+def from_pose_results(results):
+    """Pack MediaPipe pose results into a (33, 4) float32 array of x, y, z, visibility.
+
+    Returns None when no person was detected.
+    """
+    if not results.pose_landmarks:
+        return None
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+        dtype=np.float32,
+    )
+
+
+def to_pixels(landmarks, img_shape):
+    """Scale normalized landmarks to (33, 2) float32 pixel coordinates.
+
+    An empty (0, 2) array stands for "no person", so `len()` checks keep working.
+    """
+    if landmarks is None:
+        return np.empty((0, 2), dtype=np.float32)
+    h, w = img_shape[:2]
+    return landmarks[:, :2] * np.array([w, h], dtype=np.float32)
+
+
+def joint_angles(points, joints):
+    """Angles in degrees at the middle point of each (a, b, c) index triplet.
+
+    `points` is an (N, 2+) array and `joints` a (K, 3) index array; all K
+    angles are computed in one vectorized pass and folded into [0, 180].
+    """
+    joints = np.asarray(joints)
+    a = points[joints[:, 0], :2]
+    b = points[joints[:, 1], :2]
+    c = points[joints[:, 2], :2]
+    ba = a - b
+    bc = c - b
+    ang = np.abs(np.degrees(np.arctan2(bc[:, 1], bc[:, 0]) - np.arctan2(ba[:, 1], ba[:, 0])))
+    return np.where(ang > 180, 360 - ang, ang)
@@ -0,0 +1,65 @@
+import asyncio
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.config import COMMUNITY_LIKE_FLUSH_INTERVAL
+
+
+class LikeCountBuffer:
+    """Coalesces likeCount changes per post and writes them with one bulk_write.
+
+    A like storm on one post becomes a single $inc per flush interval
+    instead of one write per like. Counts not flushed yet are visible
+    through `pending`, so responses can still report the live total.
+    """
+
+    def __init__(self, collection, interval=COMMUNITY_LIKE_FLUSH_INTERVAL):
+        self.collection = collection
+        self.interval = interval
+        self._deltas = {}
+        self._task = None
+        self._sleeping = False
+
+    def add(self, post_id, delta):
+        self._deltas[post_id] = self._deltas.get(post_id, 0) + delta
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    def pending(self, post_id):
+        return self._deltas.get(post_id, 0)
+
+    async def _flush_later(self):
+        self._sleeping = True
+        try:
+            await asyncio.sleep(self.interval)
+        finally:
+            self._sleeping = False
+        await self.flush()
+
+    async def flush(self):
+        deltas, self._deltas = self._deltas, {}
+        changes = [(post_id, delta) for post_id, delta in deltas.items() if delta]
+        if not changes:
+            return
+        operations = [UpdateOne({"_id": post_id}, {"$inc": {"likeCount": delta}}) for post_id, delta in changes]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Only the operations that failed are retried on the next flush
+            print(f"Could not flush some like counts: {e}")
+            for error in e.details.get("writeErrors", []):
+                self.add(*changes[error["index"]])
+        except Exception as e:
+            # Keep the counts for the next flush rather than losing them
+            print(f"Could not flush like counts: {e}")
+            for post_id, delta in changes:
+                self.add(post_id, delta)
+
+    async def close(self):
+        task = self._task
+        if task is not None and not task.done():
+            if self._sleeping:
+                task.cancel()
+            else:
+                # Cancelling mid-flush would drop the deltas it already took; let it finish
+                await task
+        await self.flush()
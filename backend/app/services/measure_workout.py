@@ -1,159 +1,100 @@
-import cv2
-import numpy as np
-import mediapipe as mp
+import asyncio
+import json
 import base64
-# import asyncio
-# import json
-# from scipy.spatial import procrustes
-from fastapi import FastAPI, WebSocket, APIRouter
-# from fastapi.middleware.cors import CORSMiddleware
-
-# app = FastAPI()
-
-# # Allow frontend to connect
-# app.add_middleware(
-#     CORSMiddleware,
-#     allow_origins=["*"],  # Change this to your frontend domain in production
-#     allow_credentials=True,
-#     allow_methods=["*"],
-#     allow_headers=["*"],
-# )
-
-# mp_pose = mp.solutions.pose
-# pose = mp_pose.Pose()
-
-# def extract_keypoints(image):
-#     """Extracts and normalizes keypoints from an image."""
-#     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-#     results = pose.process(image_rgb)
-
-#     keypoints = []
-#     if results.pose_landmarks:
-#         for landmark in results.pose_landmarks.landmark:
-#             keypoints.append((landmark.x, landmark.y))
-
-#     return np.array(keypoints) if keypoints else None
-
-# def align_keypoints(keypoints):
-#     """Align keypoints by shifting and normalizing w.r.t. the hip center."""
-#     if keypoints is None or len(keypoints) < 25:
-#         return None
-
-#     hip_center = (keypoints[23] + keypoints[24]) / 2
-#     keypoints -= hip_center
-
-#     max_dist = np.max(np.linalg.norm(keypoints, axis=1))
-#     keypoints /= max_dist
-
-#     return keypoints
-
-# def compute_similarity(keypoints1, keypoints2):
-#     """Computes similarity using Procrustes Analysis."""
-#     if keypoints1 is None or keypoints2 is None:
-#         return 0  
-
-#     keypoints1 = align_keypoints(keypoints1)
-#     keypoints2 = align_keypoints(keypoints2)
-
-#     _, transformed1, transformed2 = procrustes(keypoints1, keypoints2)
-
-#     mse = np.mean((transformed1 - transformed2) ** 2)
-#     similarity = (1 - mse) * 100  
-#     return max(0, similarity)
-
-# async def process_video(websocket: WebSocket):
-#     """Capture frames from webcam and send similarity scores to frontend."""
-#     cap = cv2.VideoCapture(0)  # Default camera
-
-#     try:
-#         await websocket.accept()
-
-#         while cap.isOpened():
-#             ret, frame = cap.read()
-#             if not ret:
-#                 break
-
-#             height, width, _ = frame.shape
-#             left_half = frame[:, :width // 2]   # Trainer
-#             right_half = frame[:, width // 2:]  # User
-
-#             keypoints_trainer = extract_keypoints(left_half)
-#             keypoints_user = extract_keypoints(right_half)
-
-#             similarity = compute_similarity(keypoints_trainer, keypoints_user)
-
-#             # Send similarity data to frontend
-#             await websocket.send_text(json.dumps({"similarity": similarity}))
-
-#             await asyncio.sleep(0.1)  # Adjust to match frame rate
-
-#     except Exception as e:
-#         print(f"WebSocket error: {e}")
-
-#     finally:
-#         cap.release()
-#         cv2.destroyAllWindows()
-
-# @app.websocket("/ws")
-# async def websocket_endpoint(websocket: WebSocket):
-#     await process_video(websocket)
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, status
+from app.services.inference_service import decode_frame
+from app.services.pose_pool import PoolExhausted
+from app.services.session_manager import session_manager
+from app.services.trainer_reference import load_or_extract
+from app.services.alignment import IncrementalDTW
+from app.services.similarity import frame_aspect, normalize_pose, pose_similarity
 
 
 router = APIRouter()
 
 
-mp_pose =mp.solutions.pose
-pose=mp_pose.Pose()
-my_drawing=mp.solutions.drawing_utils
+# Trainer landmarks are extracted once and shared by every connection
+trainer_reference = None
+trainer_reference_lock = asyncio.Lock()
 
-trainer_cap= cv2.VideoCapture("")
+async def get_trainer_reference():
+    global trainer_reference
+    async with trainer_reference_lock:
+        if trainer_reference is None:
+            trainer_reference = await asyncio.to_thread(load_or_extract)
+    return trainer_reference
 
-def get_pose_landmarks(image):
-    image_rgb= cv2.cvtColor(image,cv2.COLOR_BGR2RGB)
-    result = pose.process(image_rgb)
+async def get_pose_landmarks(pose, image):
+    """Run pose detection in an inference worker and keep the x, y columns."""
+    landmarks = await pose.process(image)
 
-    if result.pose_landmarks:
-        return np.array([[lm.x,lm.y] for lm in result.pose_landmarks.landmark])
+    if landmarks is not None:
+        return landmarks[:, :2]
     return None
 
 
-def calculate_similarity(user_pose,trainer_pose):
+def calculate_similarity(user_pose,trainer_pose,user_aspect=1.0,trainer_aspect=1.0):
+    """Score the user's body shape against the trainer's, independent of framing and camera distance."""
     if user_pose is None or trainer_pose is None:
         return 0
-    
-    diff= np.linalg.norm(user_pose-trainer_pose,axis=1)
-    avg_diff= np.mean(diff)
 
-    score= max(0,100-avg_diff*1000)
-    return score
+    return pose_similarity(user_pose, trainer_pose, user_aspect=user_aspect, reference_aspect=trainer_aspect)
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket:WebSocket):
     await websocket.accept()
     print("websocket connection established ")
 
-    while(trainer_cap.isOpened()):
+    try:
+        reference = await get_trainer_reference()
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Trainer reference unavailable: {e}")
+        await websocket.send_text(json.dumps({"error": str(e)}))
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    try:
+        # Only the user's frames need live inference; the trainer's were precomputed
+        async with session_manager.pool.lease() as user_estimator:
+            await follow_trainer(websocket, reference, user_estimator)
+
+    except PoolExhausted as e:
+        print(f"Rejecting client: {e}")
+        await websocket.send_text(json.dumps({"error": "Server busy, try again later"}))
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+    except WebSocketDisconnect:
+        print("websocket disconnected")
+
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+        await websocket.close()
+
+async def follow_trainer(websocket, reference, user_estimator):
+    # Each session is aligned to the (looping) trainer routine at the user's own pace, comparing
+    # normalized poses so where the user stands and how far they are from the camera don't matter
+    matcher = IncrementalDTW(reference.normalized, loop=True)
+    while True:
+        user_data = await websocket.receive_text()
+
         try:
-            trainer_ret, trainer_frame= trainer_cap.read()
-            if not trainer_ret:
-                trainer_cap.set(cv2.CAP_PROP_POS_FRAMES,0)
-                continue
-            
-            trainer_frame= cv2.resize(trainer_frame,(640,480))
-            trainer_pose= get_pose_landmarks(trainer_frame)
-
-            user_data = await websocket.receive_text()
             img_bytes = base64.b64decode(user_data)  # Decode base64 image
-            np_arr = np.frombuffer(img_bytes, np.uint8)
-            user_frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+            user_frame = await decode_frame(img_bytes)
+
+            user_pose = await get_pose_landmarks(user_estimator, user_frame)
+            user_aspect = frame_aspect(user_frame.shape)
+            trainer_pose = None
+            if user_pose is not None:
+                index = matcher.update(normalize_pose(user_pose, user_aspect))
+                if reference.detected[index]:
+                    trainer_pose = reference.landmarks[index, :, :2]
 
-            user_pose = get_pose_landmarks(user_frame)
-            similarity_score = calculate_similarity(user_pose, trainer_pose)
+            similarity_score = calculate_similarity(user_pose, trainer_pose, user_aspect, reference.aspect)
 
             # Send score back to frontend
             await websocket.send_text(str(similarity_score))
 
-        except WebSocketDisconnect:
-            print("websocket disconnected")
-            break
-    trainer_cap.release()
\ No newline at end of file
+        except Exception as e:
+            print(f"Error processing frame: {e}")
+            # Undecodable or failed frames get an error message; the session carries on
+            await websocket.send_text(json.dumps({"error": str(e)}))
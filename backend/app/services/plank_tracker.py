@@ -6,61 +6,59 @@ import asyncio
 import websockets 
 import base64
 import json
+from app.services.landmarks import from_pose_results, to_pixels, joint_angles
+from app.services.pose_profiles import make_pose, EXERCISE_PROFILES
 
 
 class PlankTracker:
-    def __init__(self):
-        self.pose = mp.solutions.pose.Pose()
+    def __init__(self, render=True, profile=EXERCISE_PROFILES["plank"]):
+        self.pose = make_pose(profile)
         self.mpDraw = mp.solutions.drawing_utils
+        self.render = render  # False skips landmark drawing and text overlays
         self.holding_time = 0
         self.start_time = None
         self.threshold_angle = 170  
         self.pTime = 0
 
     def find_angle(self, a, b, c):
-        ang = np.degrees(
-            np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        )
-        return abs(ang) if abs(ang) < 180 else 360 - abs(ang)
+        return joint_angles(np.array([a, b, c], dtype=np.float32), [(0, 1, 2)])[0]
 
     def process_frame(self, img):
         imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         results = self.pose.process(imgRGB)
-        lmList = []        
-        if results.pose_landmarks:
-            h, w, _ = img.shape
-            for id, lm in enumerate(results.pose_landmarks.landmark):
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                lmList.append((cx, cy))
+        lmList = to_pixels(from_pose_results(results), img.shape)
+        if self.render and results.pose_landmarks:
             self.mpDraw.draw_landmarks(img, results.pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS)
         
         return img, lmList
 
-    def check_plank(self, img, lmList):
+    def check_plank(self, img, lmList, frame_time=None):
+        """Plank feedback for one frame; hold time is measured on `frame_time` (seconds,
+        e.g. from a SessionTimeline), falling back to the monotonic clock."""
+        if frame_time is None:
+            frame_time = time.monotonic()
         feedback = {"plank": False, "time_held": 0, "angle": 0}
 
         if len(lmList) >= 27:
-            shoulder = lmList[12]  # Right Shoulder
-            hip = lmList[24]  # Right Hip
-            ankle = lmList[28]  # Right Ankle
-
-            angle = self.find_angle(shoulder, hip, ankle)
+            # Right shoulder - right hip - right ankle
+            angle, = joint_angles(lmList, [(12, 24, 28)])
             color = (0, 0, 255)  # Red for incorrect position
             
             if angle >= self.threshold_angle:
-                feedback["angle"] =  angle
+                feedback["angle"] =  float(angle)
                 feedback["plank"] = True
                 color = (0, 255, 0)  # Green for correct plank position
                 if self.start_time is None:
-                    self.start_time = time.time()
-                self.holding_time = time.time() - self.start_time
-                feedback["time_held"] = int(time.time() - self.start_time)
+                    self.start_time = frame_time
+                self.holding_time = frame_time - self.start_time
+                feedback["time_held"] = int(self.holding_time)
             else:
                 self.start_time = None
                 self.holding_time = 0
 
-            cv2.putText(img, f'Time: {int(self.holding_time)}s', (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, color, 3)
-            cv2.putText(img, f'Angle: {int(angle)}', (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, color, 3)
+            if self.render:
+                cv2.putText(img, f'Time: {int(self.holding_time)}s', (50, 100), cv2.FONT_HERSHEY_PLAIN, 3, color, 3)
+                cv2.putText(img, f'Angle: {int(angle)}', (50, 150), cv2.FONT_HERSHEY_PLAIN, 3, color, 3)
 
         print(feedback)  # Now, this will execute
         return feedback
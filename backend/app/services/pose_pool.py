@@ -0,0 +1,58 @@
+import asyncio
+from contextlib import asynccontextmanager
+from app.services.pose_profiles import make_pose
+from app.core.config import POSE_POOL_SIZE, POSE_POOL_ACQUIRE_TIMEOUT
+
+
+class PoolExhausted(Exception):
+    """Raised when no pose estimator becomes free within the acquire timeout."""
+
+
+class PosePool:
+    """Bounded pool of pre-warmed pose estimators leased out one per session."""
+
+    def __init__(self, size=POSE_POOL_SIZE, factory=None):
+        self.size = max(1, size)
+        self.factory = factory or make_pose
+        self._free = asyncio.Queue(maxsize=self.size)
+        self._estimators = []
+
+    def warm_up(self):
+        """Create every estimator up front so the first frames don't pay for graph setup."""
+        while len(self._estimators) < self.size:
+            estimator = self.factory()
+            self._estimators.append(estimator)
+            self._free.put_nowait(estimator)
+
+    @property
+    def available(self):
+        return self._free.qsize()
+
+    async def acquire(self, timeout=POSE_POOL_ACQUIRE_TIMEOUT):
+        if not self._estimators:
+            self.warm_up()
+        try:
+            return await asyncio.wait_for(self._free.get(), timeout)
+        except asyncio.TimeoutError:
+            raise PoolExhausted(f"All {self.size} pose estimators are busy")
+
+    def release(self, estimator):
+        # Clear per-session tracking state before the next connection gets it
+        reset = getattr(estimator, "reset", None)
+        if reset is not None:
+            reset()
+        self._free.put_nowait(estimator)
+
+    @asynccontextmanager
+    async def lease(self, timeout=POSE_POOL_ACQUIRE_TIMEOUT):
+        estimator = await self.acquire(timeout)
+        try:
+            yield estimator
+        finally:
+            self.release(estimator)
+
+    def close(self):
+        for estimator in self._estimators:
+            estimator.close()
+        self._estimators = []
+        self._free = asyncio.Queue(maxsize=self.size)
@@ -0,0 +1,74 @@
+import mediapipe as mp
+from app.core.config import DEFAULT_POSE_PROFILE, LOAD_SHED_HIGH_MS, LOAD_SHED_LOW_MS
+
+# MediaPipe Pose settings for each accuracy/CPU trade-off
+POSE_PROFILES = {
+    "lite": {
+        "model_complexity": 0,
+        "smooth_landmarks": True,
+        "enable_segmentation": False,
+        "min_detection_confidence": 0.5,
+        "min_tracking_confidence": 0.5,
+    },
+    "full": {
+        "model_complexity": 1,
+        "smooth_landmarks": True,
+        "enable_segmentation": False,
+        "min_detection_confidence": 0.5,
+        "min_tracking_confidence": 0.5,
+    },
+    "heavy": {
+        "model_complexity": 2,
+        "smooth_landmarks": True,
+        "enable_segmentation": False,
+        "min_detection_confidence": 0.6,
+        "min_tracking_confidence": 0.6,
+    },
+}
+
+# Static holds and big arm movements track fine on the lite model
+EXERCISE_PROFILES = {
+    "plank": "lite",
+    "jumping_jack": "lite",
+    "squat": "full",
+    "pushup": "full",
+}
+
+LITE_PROFILE = "lite"
+
+
+def make_pose(profile=DEFAULT_POSE_PROFILE):
+    """Create a MediaPipe Pose graph configured for `profile`."""
+    return mp.solutions.pose.Pose(**POSE_PROFILES[profile])
+
+
+def resolve_profile(requested=None, exercise=None):
+    """Pick a session's profile: an explicit request wins, then the exercise's default."""
+    if requested is not None:
+        if requested not in POSE_PROFILES:
+            raise ValueError(f"Unknown pose profile: {requested}")
+        return requested
+    return EXERCISE_PROFILES.get(exercise, DEFAULT_POSE_PROFILE)
+
+
+class LoadShedPolicy:
+    """Steps every session down to the lite profile while the inference workers are saturated.
+
+    Load is the measured queueing delay (ms) of inference requests: how
+    long frames wait behind other frames, which only grows once the workers
+    can't keep up. Shedding starts at `high` and only stops once the delay
+    drops to `low`, so sessions don't flap between profiles on every frame.
+    """
+
+    def __init__(self, high=LOAD_SHED_HIGH_MS, low=LOAD_SHED_LOW_MS):
+        self.high = high
+        self.low = low
+        self.shedding = False
+
+    def apply(self, profile, delay_ms):
+        if self.shedding and delay_ms <= self.low:
+            self.shedding = False
+        elif not self.shedding and delay_ms >= self.high:
+            self.shedding = True
+            print(f"Inference requests queueing for {delay_ms:.0f} ms, stepping sessions down to {LITE_PROFILE}")
+        return LITE_PROFILE if self.shedding else profile
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+from app.core.config import INFERENCE_MAX_SIDE, ROI_PADDING
+from app.services.landmarks import X, Y, Z, VISIBILITY
+
+
+class FramePreprocessor:
+    """Crops to the person and downscales a frame before pose inference.
+
+    Once a person has been found, the next frame is cropped to a padded box
+    around their landmarks. The crop is then shrunk so its longest side is at
+    most `max_side`. `restore` maps the landmarks found in the crop back to
+    normalized full-frame coordinates, so callers never see the crop.
+
+    MediaPipe tracks and smooths landmarks in crop coordinates, so the box
+    stays put while the person is inside it (away from its edges by
+    `edge_margin` of its size) and only moves once they leave it.
+    `crop_changed` tells the caller when it did, so the graph's tracking can
+    be restarted.
+    """
+
+    def __init__(
+        self, max_side=INFERENCE_MAX_SIDE, padding=ROI_PADDING, min_visibility=0.5, min_roi_fraction=0.2,
+        edge_margin=0.05,
+    ):
+        self.max_side = max_side
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.min_roi_fraction = min_roi_fraction
+        self.edge_margin = edge_margin
+        self.roi = None  # (x0, y0, x1, y1) in normalized full-frame coordinates
+        self.box = None  # crop box (in pixels) of the previous frame
+        self.crop_changed = True  # the last prepared frame was cropped differently from the one before
+
+    def reset(self):
+        self.roi = None
+        self.box = None
+
+    def prepare(self, img):
+        """Return the frame to run inference on and the crop box (in pixels) it came from."""
+        h, w = img.shape[:2]
+        x0, y0, x1, y1 = 0, 0, w, h
+        if self.roi is not None:
+            x0, y0 = int(self.roi[0] * w), int(self.roi[1] * h)
+            x1, y1 = int(np.ceil(self.roi[2] * w)), int(np.ceil(self.roi[3] * h))
+        crop = img[y0:y1, x0:x1]
+
+        ch, cw = crop.shape[:2]
+        scale = self.max_side / max(ch, cw)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, int(cw * scale)), max(1, int(ch * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            # Shared memory needs a contiguous buffer; a crop is a strided view
+            crop = np.ascontiguousarray(crop)
+        box = (x0, y0, x1, y1, w, h)
+        self.crop_changed = box != self.box
+        self.box = box
+        return crop, box
+
+    def restore(self, landmarks, box):
+        """Map landmarks from crop coordinates back to the full frame and update the ROI."""
+        if landmarks is None:
+            # Lost the person: search the whole frame next time
+            self.roi = None
+            return None
+
+        x0, y0, x1, y1, w, h = box
+        restored = landmarks.copy()
+        restored[:, X] = (x0 + landmarks[:, X] * (x1 - x0)) / w
+        restored[:, Y] = (y0 + landmarks[:, Y] * (y1 - y0)) / h
+        restored[:, Z] = landmarks[:, Z] * (x1 - x0) / w
+        self._update_roi(restored)
+        return restored
+
+    def _update_roi(self, landmarks):
+        visible = landmarks[landmarks[:, VISIBILITY] >= self.min_visibility]
+        if len(visible) < 2:
+            self.roi = None
+            return
+
+        lo = visible[:, :2].min(axis=0)
+        hi = visible[:, :2].max(axis=0)
+        if self.roi is not None and self._inside_roi(lo, hi):
+            return
+        size = np.maximum(hi - lo, self.min_roi_fraction)
+        pad = size.max() * self.padding
+        lo = np.clip(lo - pad, 0, 1)
+        hi = np.clip(hi + pad, 0, 1)
+        self.roi = (float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1]))
+
+    def _inside_roi(self, lo, hi):
+        """Whether the person's box (lo, hi) keeps clear of the ROI's edges (edges on the frame border don't count)."""
+        roi_lo = np.array(self.roi[:2])
+        roi_hi = np.array(self.roi[2:])
+        margin = (roi_hi - roi_lo) * self.edge_margin
+        inner_lo = np.where(roi_lo > 0, roi_lo + margin, 0)
+        inner_hi = np.where(roi_hi < 1, roi_hi - margin, 1)
+        return bool(np.all(lo >= inner_lo) and np.all(hi <= inner_hi))
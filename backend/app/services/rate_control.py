@@ -0,0 +1,59 @@
+import asyncio
+from app.core.config import FRAME_MIN_INTERVAL_MS, FRAME_MAX_INTERVAL_MS
+
+
+class LatestFrameMailbox:
+    """Holds at most one pending frame per connection; a newer frame replaces an unprocessed one."""
+
+    def __init__(self):
+        self._item = None
+        self._error = None
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item):
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self.received += 1
+        self._ready.set()
+
+    def close(self, error):
+        """Wake the consumer with `error` once the pending frame (if any) is taken."""
+        self._error = error
+        self._ready.set()
+
+    async def get(self):
+        await self._ready.wait()
+        if self._item is None:
+            raise self._error
+        item, self._item = self._item, None
+        if self._error is None:
+            self._ready.clear()
+        return item
+
+
+class RateController:
+    """Suggests a client send interval from a moving average of per-frame processing time."""
+
+    def __init__(self, min_interval_ms=FRAME_MIN_INTERVAL_MS, max_interval_ms=FRAME_MAX_INTERVAL_MS, alpha=0.2, headroom=1.25):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.alpha = alpha
+        self.headroom = headroom
+        self.avg_processing_ms = None
+
+    def observe(self, processing_seconds):
+        ms = processing_seconds * 1000
+        if self.avg_processing_ms is None:
+            self.avg_processing_ms = ms
+        else:
+            self.avg_processing_ms += self.alpha * (ms - self.avg_processing_ms)
+
+    @property
+    def suggested_interval_ms(self):
+        if self.avg_processing_ms is None:
+            return self.min_interval_ms
+        interval = self.avg_processing_ms * self.headroom
+        return int(min(self.max_interval_ms, max(self.min_interval_ms, interval)))
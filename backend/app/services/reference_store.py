@@ -0,0 +1,161 @@
+"""Binary, memory-mapped store for reference workouts.
+
+A reference file is a 32-byte little-endian header followed by one
+contiguous float32 array of shape (frames, landmarks, dims):
+
+    offset  size  field
+    0       8     magic b"PULSEREF"
+    8       2     format version (1)
+    10      2     landmarks per frame (33)
+    12      2     dims per landmark (3 for x, y, z; 4 adds visibility)
+    14      2     source frame width in pixels (0 if unknown)
+    16      4     number of frames
+    20      4     number of the first frame (frame_N keys in the old JSON)
+    24      4     frames per second (0 if unknown)
+    28      4     source frame height in pixels (0 if unknown)
+
+The frame size lets x and y be compared in the same unit (MediaPipe
+normalizes them to width and height separately). Landmarks missing from a
+frame are stored as NaN. Files are opened with
+np.memmap, so the pages are shared by every process that maps the same
+routine and only the frames actually read are loaded.
+
+Convert the old JSON format (from backend/):
+
+    python -m app.services.reference_store selected_landmarks.json selected_landmarks.ref
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+from app.services.landmarks import LANDMARK_INDEX, NUM_LANDMARKS
+from app.core.config import REFERENCE_DIR
+
+MAGIC = b"PULSEREF"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHHIIfI")
+HEADER_SIZE = HEADER.size
+EXTENSION = ".ref"
+
+
+class ReferenceWorkout:
+    """A memory-mapped reference workout."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                magic, version, landmarks, dims, width, frames, first_frame, fps, height = HEADER.unpack(f.read(HEADER.size))
+            except struct.error:
+                raise ValueError(f"{path} is not a reference workout file (truncated header)")
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a reference workout file")
+
+        self.path = path
+        self.first_frame = first_frame
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.landmarks = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE, shape=(frames, landmarks, dims))
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    def frame(self, frame_number):
+        """Landmarks of frame `frame_number` (numbered as in the source), or None past the end."""
+        index = frame_number - self.first_frame
+        if index < 0 or index >= len(self):
+            return None
+        return self.landmarks[index]
+
+    @property
+    def aspect(self):
+        """Width / height of the source frames, 1.0 if the file does not record them."""
+        return self.width / self.height if self.width and self.height else 1.0
+
+
+def write_reference(path, landmarks, fps=0.0, first_frame=0, width=0, height=0):
+    """Write a (frames, landmarks, dims) array as a reference workout file.
+
+    The file is written next to `path` and renamed into place, so other
+    processes only ever map a missing or a complete file.
+    """
+    landmarks = np.ascontiguousarray(landmarks, dtype="<f4")
+    frames, count, dims = landmarks.shape
+    header = HEADER.pack(MAGIC, VERSION, count, dims, width, frames, first_frame, fps, height)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=EXTENSION + ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(landmarks.tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def convert_json(json_path, out_path):
+    """Convert a selected_landmarks.json-style file (frame_N -> name -> {x, y, z})."""
+    with open(json_path, "r") as file:
+        data = json.load(file)
+
+    numbers = sorted(int(key.split("_", 1)[1]) for key in data)
+    if not numbers:
+        raise ValueError(f"{json_path} has no frames")
+    first_frame = numbers[0]
+    count = numbers[-1] - first_frame + 1
+    landmarks = np.full((count, NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+    for number in numbers:
+        for name, coords in data[f"frame_{number}"].items():
+            index = LANDMARK_INDEX.get(name)
+            if index is not None:
+                landmarks[number - first_frame, index] = (coords["x"], coords["y"], coords["z"])
+
+    write_reference(out_path, landmarks, first_frame=first_frame)
+    return count
+
+
+_routines = {}
+
+
+def open_routine(name, directory=REFERENCE_DIR):
+    """Open (once per process) the reference workout `name`, converting its JSON on first use."""
+    if name in _routines:
+        return _routines[name]
+    if os.path.basename(name) != name:
+        raise ValueError(f"Invalid routine name: {name}")
+
+    path = os.path.join(directory, name + EXTENSION)
+    if not os.path.exists(path):
+        json_path = os.path.join(directory, name + ".json")
+        if not os.path.exists(json_path):
+            raise FileNotFoundError(f"No reference workout named {name}")
+        convert_json(json_path, path)
+
+    routine = _routines[name] = ReferenceWorkout(path)
+    return routine
+
+
+async def get_routine(name, directory=REFERENCE_DIR):
+    """open_routine for the event loop: a first-use JSON conversion runs on a thread."""
+    if name in _routines:
+        return _routines[name]
+    return await asyncio.to_thread(open_routine, name, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a landmark JSON file to a reference workout file")
+    parser.add_argument("json_path")
+    parser.add_argument("output", nargs="?")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.json_path)[0] + EXTENSION
+    frames = convert_json(args.json_path, output)
+    print(f"Wrote {frames} frames to {output}")
+
+
+if __name__ == "__main__":
+    main()
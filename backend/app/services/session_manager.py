@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from app.services.exercise_tracker import ExerciseTracker
+from app.services.pose_pool import PosePool
+from app.services.rate_control import LatestFrameMailbox, RateController
+from app.services.pose_profiles import resolve_profile
+from app.services.smoothing import make_filter
+from app.services.frame_skipping import FrameSkipper
+from app.services.timeline import SessionTimeline
+from app.services.inference_service import inference_service
+from app.core.config import POSE_POOL_ACQUIRE_TIMEOUT
+
+
+class ExerciseSession:
+    """Tracking state owned by a single websocket connection.
+
+    The pose estimator is leased from `pool` on the first image frame and
+    kept until the connection ends, so sessions that only send on-device
+    landmarks never hold one.
+    """
+
+    def __init__(self, pool, exercise=None, render=False, profile=None, smoothing=None, infer_every=None, timeout=POSE_POOL_ACQUIRE_TIMEOUT):
+        self.id = uuid.uuid4().hex
+        self.pool = pool
+        self.timeout = timeout
+        self.pose = None
+        self.tracker = ExerciseTracker(exercise=exercise, render=render)
+        self.mailbox = LatestFrameMailbox()
+        self.rate = RateController()
+        self.requested_profile = profile
+        self.timeline = SessionTimeline()
+        self.profile = resolve_profile(profile, exercise)
+        self.filter = make_filter(smoothing)
+        self.skipper = FrameSkipper() if infer_every is None else FrameSkipper(every=infer_every)
+
+    async def estimator(self):
+        """The session's pose estimator, leased on first use; raises PoolExhausted if none frees up in time."""
+        if self.pose is None:
+            pose = await self.pool.acquire(self.timeout)
+            pose.profile = self.profile
+            self.pose = pose
+        return self.pose
+
+    def release(self):
+        """Hand the estimator (if one was leased) back to the pool."""
+        if self.pose is not None:
+            self.pool.release(self.pose)
+            self.pose = None
+
+    async def detect(self, img, timestamp=None):
+        """Landmarks for one frame: inferred, or extrapolated when skip-frame mode lets the frame skip inference."""
+        timestamp = self.timeline.time_of() if timestamp is None else timestamp
+        # The motion check resizes the full frame, so it runs off the event loop like decoding
+        if not self.skipper.enabled or await asyncio.to_thread(self.skipper.needs_inference, img):
+            pose = await self.estimator()
+            landmarks = await pose.process(img)
+            self.skipper.keyframe(landmarks, timestamp)
+            return landmarks
+        return self.skipper.estimate(timestamp)
+
+    def smooth(self, landmarks, timestamp=None):
+        """Run the session's temporal filter over one frame's landmarks."""
+        if self.filter is None:
+            return landmarks
+        return self.filter(landmarks, self.timeline.time_of() if timestamp is None else timestamp)
+
+    def set_exercise(self, exercise):
+        """Declare the exercise mid-session; also switches to its pose profile unless one was requested."""
+        self.tracker.set_exercise(exercise)
+        self.profile = resolve_profile(self.requested_profile, exercise)
+        if self.pose is not None:
+            self.pose.profile = self.profile
+
+
+class SessionManager:
+    """Hands each connection its own ExerciseTracker, backed by a pose estimator once it sends images.
+
+    Estimators are handles to Pose graphs owned by the inference service's
+    worker processes, so inference never runs on the event loop.
+    """
+
+    def __init__(self, service=inference_service, pool=None):
+        self.service = service
+        self.pool = pool or PosePool(size=service.num_slots, factory=service.create_estimator)
+        self.sessions = {}
+
+    def start(self):
+        self.service.start()
+        self.pool.warm_up()
+
+    def stop(self):
+        self.pool.close()
+        self.service.stop()
+
+    @asynccontextmanager
+    async def session(self, exercise=None, render=False, profile=None, smoothing=None, infer_every=None, timeout=POSE_POOL_ACQUIRE_TIMEOUT):
+        """Tracking state for the lifetime of a connection.
+
+        An estimator is only leased once the session needs inference. The
+        session then waits up to `timeout` seconds for a free one and raises
+        PoolExhausted if none frees up, so callers can reject the client.
+        Sessions are headless unless `render` asks for annotated frames, and
+        use `profile` or else the exercise's default pose profile, and
+        `smoothing` or else the configured landmark filter. `infer_every`
+        overrides how often skip-frame mode runs inference.
+        """
+        session = ExerciseSession(self.pool, exercise, render, profile, smoothing, infer_every, timeout)
+        self.sessions[session.id] = session
+        try:
+            yield session
+        finally:
+            self.sessions.pop(session.id, None)
+            session.release()
+
+
+session_manager = SessionManager()
@@ -0,0 +1,66 @@
+"""Pose similarity that ignores where the user stands, how far from the camera
+they are and how the camera is rolled.
+
+MediaPipe landmarks are normalized separately to the frame's width and
+height, so x is first rescaled by the frame's aspect ratio (width / height)
+to make both axes the same unit; otherwise a portrait trainer video and a
+landscape webcam see the same body stretched differently. Both poses are
+then centered on the hips, scaled to unit size and rotated onto each other (2D orthogonal Procrustes, solved in closed form so no SciPy or
+SVD is needed per frame). What remains is the difference in body shape.
+"""
+import numpy as np
+
+LEFT_HIP, RIGHT_HIP = 23, 24
+
+# Procrustes disparity (0 = identical shape, 1 = unrelated) at which the score reaches 0
+DEFAULT_TOLERANCE = 0.25
+
+
+def frame_aspect(shape):
+    """Width / height of an image of shape (height, width, ...)."""
+    return shape[1] / shape[0]
+
+
+def normalize_pose(points, aspect=1.0):
+    """Hip-centered, unit-size copy of (..., 33, 2+) landmarks (x, y only).
+
+    `aspect` is the width / height of the frame the landmarks came from.
+    Returns NaN rows for poses whose hips are missing.
+    """
+    points = np.asarray(points, dtype=np.float32)[..., :2] * np.array([aspect, 1], dtype=np.float32)
+    centered = points - (points[..., LEFT_HIP, :] + points[..., RIGHT_HIP, :])[..., None, :] / 2
+    size = np.sqrt(np.nansum(centered ** 2, axis=(-2, -1), keepdims=True))
+    return np.divide(centered, size, out=np.full_like(centered, np.nan), where=size > 0)
+
+
+def procrustes_disparity(user, reference, weights=None, user_aspect=1.0, reference_aspect=1.0):
+    """Procrustes disparity between poses after rotating `user` onto `reference`.
+
+    Inputs are (..., 33, 2+) landmarks; landmarks that are NaN on either side
+    are left out. The aspects are the width / height of each side's frame.
+    Returns a float for a single pair or an array for a batch.
+    """
+    a = normalize_pose(user, user_aspect)
+    b = normalize_pose(reference, reference_aspect)
+    valid = ~(np.isnan(a[..., 0]) | np.isnan(b[..., 0]))
+    w = valid.astype(np.float32) if weights is None else valid * np.asarray(weights, dtype=np.float32)
+    a = np.where(valid[..., None], a, 0)
+    b = np.where(valid[..., None], b, 0)
+
+    # Weighted norms, and the dot/cross terms that give the best rotation in closed form
+    norm_a = np.sqrt(np.sum(w * np.sum(a * a, axis=-1), axis=-1))
+    norm_b = np.sqrt(np.sum(w * np.sum(b * b, axis=-1), axis=-1))
+    dot = np.sum(w * (a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1]), axis=-1)
+    cross = np.sum(w * (a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]), axis=-1)
+
+    denom = norm_a * norm_b
+    correlation = np.divide(np.hypot(dot, cross), denom, out=np.zeros_like(denom), where=denom > 0)
+    disparity = 1 - np.minimum(correlation, 1) ** 2
+    return float(disparity) if np.ndim(disparity) == 0 else disparity
+
+
+def pose_similarity(user, reference, weights=None, tolerance=DEFAULT_TOLERANCE, user_aspect=1.0, reference_aspect=1.0):
+    """0-100 score of how closely `user` matches the shape of `reference`."""
+    disparity = procrustes_disparity(user, reference, weights, user_aspect, reference_aspect)
+    score = np.clip(1 - np.asarray(disparity) / tolerance, 0, 1) * 100
+    return float(score) if np.ndim(score) == 0 else score
@@ -0,0 +1,95 @@
+"""Per-session temporal filters over (33, 4) landmark arrays.
+
+Filters are time-aware (they take the frame timestamp in seconds), so they
+behave the same whatever rate the client sends frames at. A missing pose
+resets the filter, so a person stepping back into view is not blended with
+where they were before.
+"""
+import numpy as np
+from app.core.config import LANDMARK_FILTER, ONE_EURO_MIN_CUTOFF, ONE_EURO_BETA, EMA_TIME_CONSTANT
+
+# Guards against duplicate or out-of-order timestamps
+MIN_DT = 1e-3
+
+
+class EMAFilter:
+    """Exponential moving average with a fixed time constant."""
+
+    def __init__(self, time_constant=EMA_TIME_CONSTANT):
+        self.time_constant = time_constant
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._timestamp = None
+
+    def __call__(self, landmarks, timestamp):
+        if landmarks is None:
+            self.reset()
+            return None
+        if self._value is None:
+            self._value = np.array(landmarks, dtype=np.float32)
+        else:
+            dt = max(timestamp - self._timestamp, MIN_DT)
+            alpha = 1 - np.exp(-dt / self.time_constant)
+            self._value += alpha * (landmarks - self._value)
+        self._timestamp = timestamp
+        return self._value.copy()
+
+
+class OneEuroFilter:
+    """One-Euro filter (Casiez et al.): heavy smoothing at rest, little lag when moving fast.
+
+    Every coordinate gets its own adaptive cutoff, computed for the whole
+    array at once.
+    """
+
+    def __init__(self, min_cutoff=ONE_EURO_MIN_CUTOFF, beta=ONE_EURO_BETA, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._speed = None
+        self._timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1 / (2 * np.pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def __call__(self, landmarks, timestamp):
+        if landmarks is None:
+            self.reset()
+            return None
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        if self._value is None:
+            self._value = landmarks.copy()
+            self._speed = np.zeros_like(landmarks)
+        else:
+            dt = max(timestamp - self._timestamp, MIN_DT)
+            speed = (landmarks - self._value) / dt
+            self._speed += self._alpha(self.d_cutoff, dt) * (speed - self._speed)
+            cutoff = self.min_cutoff + self.beta * np.abs(self._speed)
+            self._value += self._alpha(cutoff, dt) * (landmarks - self._value)
+        self._timestamp = timestamp
+        return self._value.copy()
+
+
+# Filter name -> factory; "none" passes landmarks through untouched
+LANDMARK_FILTERS = {
+    "none": None,
+    "ema": EMAFilter,
+    "one_euro": OneEuroFilter,
+}
+
+
+def make_filter(name=None):
+    """Create a fresh filter for one session, or None for no smoothing."""
+    name = name or LANDMARK_FILTER
+    if name not in LANDMARK_FILTERS:
+        raise ValueError(f"Unknown landmark filter: {name}")
+    factory = LANDMARK_FILTERS[name]
+    return factory() if factory is not None else None
@@ -0,0 +1,33 @@
+import time
+
+
+class SessionTimeline:
+    """Monotonic per-session clock, in seconds since the session's first frame.
+
+    Frames carrying a client capture timestamp (milliseconds, any origin,
+    e.g. performance.now()) are placed on the client's timeline, so queueing,
+    dropped frames or slow inference on the server don't stretch or shrink
+    durations. Frames without one fall back to the server's monotonic clock.
+    Times never go backwards: a frame older than the last one seen gets the
+    last time again.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._client_origin = None
+        self._server_origin = None
+        self.last = 0.0
+
+    def time_of(self, client_timestamp_ms=None):
+        """Session time of a frame captured at `client_timestamp_ms` (None: received now)."""
+        if client_timestamp_ms is not None:
+            if self._client_origin is None:
+                self._client_origin = client_timestamp_ms - self.last * 1000
+            seconds = (client_timestamp_ms - self._client_origin) / 1000
+        else:
+            now = self.clock()
+            if self._server_origin is None:
+                self._server_origin = now - self.last
+            seconds = now - self._server_origin
+        self.last = max(self.last, seconds)
+        return self.last
@@ -0,0 +1,98 @@
+"""Trainer pose sequence extracted once from the trainer video.
+
+Extract offline (from backend/):
+
+    python -m app.services.trainer_reference trainer.mp4 trainer_reference.ref
+
+or let the server do it on first use when only TRAINER_VIDEO_PATH is set.
+"""
+import argparse
+import os
+import cv2
+import numpy as np
+from app.services.landmarks import from_pose_results, NUM_LANDMARKS
+from app.services.pose_profiles import make_pose
+from app.services.reference_store import ReferenceWorkout, write_reference
+from app.services.similarity import normalize_pose
+from app.core.config import TRAINER_VIDEO_PATH, TRAINER_REFERENCE_PATH
+
+
+class TrainerReference:
+    """Per-frame trainer landmarks shared by every session following the trainer."""
+
+    def __init__(self, landmarks, fps, width=0, height=0):
+        self.landmarks = landmarks  # (frames, 33, 4) float32, NaN where no pose was found
+        self.fps = fps
+        self.width = width  # trainer video frame size, 0 if unknown
+        self.height = height
+        self.aspect = width / height if width and height else 1.0
+        self.detected = ~np.isnan(landmarks[:, 0, 0])
+        # Hip-centered, unit-size poses, so live alignment ignores where the trainer stood
+        self.normalized = normalize_pose(landmarks, self.aspect)
+
+    def __len__(self):
+        return len(self.landmarks)
+
+
+def extract_reference(video_path, profile="heavy"):
+    """Run pose detection over every frame of the trainer video."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open trainer video {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    pose = make_pose(profile)
+    frames = []
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            height, width = frame.shape[:2]  # as decoded, so rotated videos report their upright size
+            landmarks = from_pose_results(pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+            if landmarks is None:
+                landmarks = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+            frames.append(landmarks)
+    finally:
+        cap.release()
+        pose.close()
+
+    if not frames:
+        raise ValueError(f"Trainer video {video_path} has no frames")
+    return TrainerReference(np.stack(frames), fps, width, height)
+
+
+def save_reference(reference, path):
+    write_reference(path, reference.landmarks, fps=reference.fps, width=reference.width, height=reference.height)
+
+
+def load_reference(path):
+    # Memory-mapped, so every worker process shares the same pages
+    stored = ReferenceWorkout(path)
+    return TrainerReference(stored.landmarks, stored.fps, stored.width, stored.height)
+
+
+def load_or_extract(reference_path=TRAINER_REFERENCE_PATH, video_path=TRAINER_VIDEO_PATH):
+    """Load the cached landmark file, extracting (and caching) it from the video if missing."""
+    if os.path.exists(reference_path):
+        return load_reference(reference_path)
+    if not video_path:
+        raise FileNotFoundError(f"No trainer reference at {reference_path} and TRAINER_VIDEO_PATH is not set")
+    reference = extract_reference(video_path)
+    save_reference(reference, reference_path)
+    return reference
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract trainer landmarks from a video")
+    parser.add_argument("video")
+    parser.add_argument("output", nargs="?", default=TRAINER_REFERENCE_PATH)
+    parser.add_argument("--profile", default="heavy", help="pose profile to extract with (lite, full, heavy)")
+    args = parser.parse_args()
+
+    reference = extract_reference(args.video, args.profile)
+    save_reference(reference, args.output)
+    print(f"Saved {len(reference)} frames ({int(reference.detected.sum())} with a pose) at {reference.fps:.1f} fps to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
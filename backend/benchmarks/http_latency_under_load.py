@@ -0,0 +1,125 @@
+"""Measure HTTP route latency while websocket clients stream frames to /ws.
+
+Start the backend first (from backend/):
+
+    uvicorn app.api.main:app --port 8000
+
+then run:
+
+    python benchmarks/http_latency_under_load.py --clients 8 --fps 10 --duration 30
+
+Each simulated client sends a JPEG to /ws at the given rate and waits for the
+feedback, while a separate probe requests the HTTP route in a tight loop and
+records how long every request takes. Run it against the old and new server
+to compare p50/p95/p99.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import time
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+import websockets
+
+
+def load_frame(path):
+    """Read a JPEG from disk, or synthesise one at webcam resolution."""
+    if path:
+        with open(path, "rb") as f:
+            return f.read()
+    noise = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    # Blurred noise compresses to roughly the size of a real webcam JPEG
+    img = cv2.GaussianBlur(noise, (31, 31), 0)
+    ok, encoded = cv2.imencode(".jpg", img)
+    return encoded.tobytes()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def stream_client(ws_url, frame_b64, fps, stop_at, stats):
+    interval = 1 / fps
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            await ws.send(json.dumps({"frame": frame_b64}))
+            await ws.recv()
+            stats["frames"] += 1
+            await asyncio.sleep(max(0, interval - (time.perf_counter() - started)))
+
+
+async def http_get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+
+async def probe_http(http_url, duration):
+    url = urlparse(http_url)
+    stop_at = time.perf_counter() + duration
+    latencies = []
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        await http_get(url.hostname, url.port or 80, url.path or "/")
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def probe_process(http_url, duration, results):
+    # Runs in its own process so the streaming clients can't skew the timings
+    results.put(asyncio.run(probe_http(http_url, duration)))
+
+
+async def run(args):
+    frame_b64 = base64.b64encode(load_frame(args.image)).decode()
+    stop_at = time.perf_counter() + args.duration
+    stats = {"frames": 0}
+
+    probe_results = multiprocessing.Queue()
+    probe = multiprocessing.Process(target=probe_process, args=(args.http_url, args.duration, probe_results))
+    probe.start()
+
+    clients = [
+        stream_client(args.ws_url, frame_b64, args.fps, stop_at, stats)
+        for _ in range(args.clients)
+    ]
+    results = await asyncio.gather(*clients, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    latencies = await asyncio.to_thread(probe_results.get)
+    probe.join()
+
+    print(f"clients={args.clients} fps={args.fps} duration={args.duration}s")
+    print(f"frames processed: {stats['frames']} ({stats['frames'] / args.duration:.1f}/s)")
+    print(f"http requests: {len(latencies)}")
+    for pct in (50, 95, 99):
+        print(f"http p{pct}: {percentile(latencies, pct):.1f} ms")
+    if errors:
+        print(f"client errors: {len(errors)} (first: {errors[0]!r})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ws-url", default="ws://localhost:8000/ws")
+    parser.add_argument("--http-url", default="http://localhost:8000/")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--image", help="JPEG to stream; a random 640x480 frame is used if omitted")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Micro-benchmark for the pose similarity used by the trainer-follow /ws route.
+
+Run from backend/:
+
+    python -m benchmarks.pose_similarity --iterations 20000
+
+Scoring runs once per frame next to pose inference (tens of milliseconds),
+so a single comparison should stay well under 1 ms.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.similarity import frame_aspect, pose_similarity
+
+TARGET_MS = 1.0
+
+
+def random_pose(rng):
+    """A plausible (33, 2) normalized pose: a jittered body centered in the frame."""
+    return (0.5 + rng.normal(0, 0.15, (33, 2))).astype(np.float32)
+
+
+def transformed(pose, rng):
+    """The same pose shifted, scaled and rolled as if seen by another camera."""
+    angle = rng.uniform(-0.3, 0.3)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+    return (pose @ rotation.T) * rng.uniform(0.5, 1.5) + rng.uniform(-0.2, 0.2, 2).astype(np.float32)
+
+
+def in_frame(pose, shape):
+    """`pose` (in pixels of a 1000 px tall scene) as landmarks normalized to a frame of `shape`."""
+    height, width = shape[:2]
+    scale = height / 1000
+    return (pose * scale / np.array([width, height]) + [0.5, 0]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time one user/trainer pose comparison")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    user = random_pose(rng)
+    trainer = transformed(user, rng)
+    print(f"same pose, other framing: {pose_similarity(user, trainer):.1f}")
+    print(f"unrelated pose:           {pose_similarity(user, random_pose(rng)):.1f}")
+
+    # One body seen by a portrait (9:16) trainer video and a 4:3 webcam
+    body = (random_pose(rng) - [0.5, 0]) * 1000
+    portrait, webcam = (1280, 720), (480, 640)
+    trainer_view, user_view = in_frame(body, portrait), in_frame(body, webcam)
+    print(f"9:16 trainer, 4:3 user:   {pose_similarity(user_view, trainer_view):.1f} ignoring aspect, "
+          f"{pose_similarity(user_view, trainer_view, user_aspect=frame_aspect(webcam), reference_aspect=frame_aspect(portrait)):.1f} with it")
+
+    for _ in range(1000):
+        pose_similarity(user, trainer)
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        pose_similarity(user, trainer)
+    per_call_ms = (time.perf_counter() - start) / args.iterations * 1000
+
+    batch = np.stack([random_pose(rng) for _ in range(1000)])
+    start = time.perf_counter()
+    pose_similarity(batch, trainer)
+    batch_ms = (time.perf_counter() - start) / len(batch) * 1000
+
+    print(f"per comparison: {per_call_ms:.4f} ms  (batched: {batch_ms:.4f} ms)  target < {TARGET_MS} ms")
+    if per_call_ms >= TARGET_MS:
+        raise SystemExit("similarity is over budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Checks that live DTW alignment is what makes /ws/workout accuracy meaningful.
+
+Run from backend/:
+
+    python -m benchmarks.workout_alignment
+
+A synthetic routine (arms and legs swinging through a full range) is
+replayed as a user at several tempos, with landmark noise. Each user frame
+is scored the way /ws/workout scores it, once against the reference frame
+with the same index (one reference frame per received frame, as before
+alignment) and once against the frame IncrementalDTW picks. At the
+reference tempo both should score high; away from it only the aligned
+score should.
+"""
+import argparse
+
+import numpy as np
+
+from app.services.accuracy import score_frames, DEFAULT_DISTANCE_THRESHOLD
+from app.services.alignment import IncrementalDTW
+from app.services.landmarks import NUM_LANDMARKS
+
+MOVING = {11: 1.0, 12: -1.0, 13: 1.5, 14: -1.5, 15: 2.0, 16: -2.0, 25: 0.8, 26: -0.8, 27: 1.2, 28: -1.2}
+
+
+def routine_pose(phase, rng_base):
+    """Reference pose at `phase` (radians through the exercise cycle)."""
+    pose = rng_base.copy()
+    for index, amplitude in MOVING.items():
+        pose[index, 0] += 0.1 * amplitude * np.sin(phase)
+        pose[index, 1] += 0.1 * abs(amplitude) * (1 - np.cos(phase)) / 2
+    return pose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a synthetic session at several tempos, with and without alignment")
+    parser.add_argument("--frames", type=int, default=300, help="reference length")
+    parser.add_argument("--noise", type=float, default=0.01, help="landmark noise, normalized units")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    base[:, :2] = 0.5 + rng.normal(0, 0.1, (NUM_LANDMARKS, 2))
+    cycles = 4
+    phases = np.linspace(0, 2 * np.pi * cycles, args.frames)
+    reference = np.stack([routine_pose(p, base) for p in phases]).astype(np.float32)
+
+    print(f"threshold {DEFAULT_DISTANCE_THRESHOLD} (normalized), noise {args.noise}")
+    print(f"{'tempo':>6} {'index-locked':>13} {'aligned':>8}")
+    for tempo in (1.0, 0.7, 1.3, 0.5):
+        positions = np.arange(0, args.frames - 1, tempo)
+        matcher = IncrementalDTW(reference)
+        locked, aligned = [], []
+        for i, position in enumerate(positions):
+            user = routine_pose(np.interp(position, np.arange(args.frames), phases), base)
+            user = user + rng.normal(0, args.noise, user.shape).astype(np.float32)
+            locked.append(score_frames(user, reference[i]) if i < args.frames else 0.0)
+            aligned.append(score_frames(user, reference[matcher.update(user)]))
+        print(f"{tempo:>6.1f} {np.mean(locked):>12.1f}% {np.mean(aligned):>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
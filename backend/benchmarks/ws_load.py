@@ -0,0 +1,315 @@
+"""Load generator for the /ws and /ws/workout websocket routes.
+
+Start the backend first (from backend/):
+
+    uvicorn app.api.main:app --port 8000
+
+then replay frames from N clients (also from backend/):
+
+    python -m benchmarks.ws_load --route /ws --clients 16 --fps 10 --duration 30 \
+        --frames recordings/squat/ --server-pid $(pgrep -f "uvicorn app.api.main") --json run.json
+
+or let the tool start (and stop) the server itself with --start-server.
+
+Clients send on a fixed schedule (they don't wait for feedback), like a
+camera would. Frames are either JPEG files (--frames, a directory or glob,
+replayed in name order) or a landmark dump (--landmarks, a .npy array of
+(frames, 33, 2-4) normalized landmarks sent as on-device landmark messages).
+Without either, a synthetic webcam-sized JPEG is used.
+
+Reports throughput, p50/p95/p99 feedback latency (send to matching reply,
+matched by seq), frames the server dropped or never answered, and the
+server's CPU and RSS (summed over the server and its inference workers,
+read from /proc, so Linux only). Everything runs locally; no network
+access is needed. Save a run with --json and pass it as --baseline to a
+later run to print the differences.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+import websockets
+
+from app.services.frame_protocol import encode_frame, encode_landmarks
+from benchmarks.http_latency_under_load import load_frame, percentile
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def load_jpegs(pattern):
+    """JPEG bytes from a directory or glob, in name order."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.jp*g")
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise SystemExit(f"No JPEG files match {pattern}")
+    frames = []
+    for path in paths:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def build_messages(args):
+    """One payload factory per recorded frame: fn(seq, timestamp_ms) -> bytes."""
+    if args.landmarks:
+        dump = np.load(args.landmarks).astype(np.float32)
+        if dump.ndim != 3 or dump.shape[1] != 33:
+            raise SystemExit("--landmarks must be a (frames, 33, 2-4) array")
+        return [
+            lambda seq, ts, lm=lm: encode_landmarks(lm, args.width, args.height, args.exercise, seq=seq, timestamp=ts)
+            for lm in dump
+        ]
+    jpegs = load_jpegs(args.frames) if args.frames else [load_frame(None)]
+    return [lambda seq, ts, jpeg=jpeg: encode_frame(jpeg, args.exercise, seq=seq, timestamp=ts) for jpeg in jpegs]
+
+
+class ClientStats:
+    def __init__(self):
+        self.sent = 0
+        self.answered = 0
+        self.errors = 0
+        self.latencies = []  # ms
+        self.server_dropped = 0
+
+
+async def run_client(url, messages, fps, duration, grace, offset, stats):
+    """Send frames at `fps` for `duration` seconds while collecting replies."""
+    sent_at = {}
+    done_sending = asyncio.Event()
+
+    async with websockets.connect(url, max_size=None) as ws:
+        async def receive():
+            while True:
+                try:
+                    reply = await ws.recv()
+                except websockets.ConnectionClosed:
+                    return
+                if isinstance(reply, bytes):
+                    continue  # annotated JPEG
+                data = json.loads(reply)
+                if "error" in data:
+                    stats.errors += 1
+                    continue
+                seq = data.get("seq")
+                if seq in sent_at:
+                    stats.latencies.append((time.perf_counter() - sent_at.pop(seq)) * 1000)
+                    stats.answered += 1
+                stats.server_dropped = max(stats.server_dropped, data.get("dropped_frames", 0))
+                if done_sending.is_set() and not sent_at:
+                    return
+
+        receiver = asyncio.create_task(receive())
+        interval = 1 / fps
+        start = time.perf_counter()
+        seq = 0
+        while time.perf_counter() - start < duration and not receiver.done():
+            now = time.perf_counter()
+            make = messages[(offset + seq) % len(messages)]
+            sent_at[seq] = now
+            await ws.send(make(seq, now * 1000))
+            stats.sent += 1
+            seq += 1
+            await asyncio.sleep(max(0, start + seq * interval - time.perf_counter()))
+
+        done_sending.set()
+        try:
+            # Replies to frames the server dropped never come; stop waiting after the grace period
+            await asyncio.wait_for(receiver, grace)
+        except asyncio.TimeoutError:
+            pass
+
+
+def process_tree(pid):
+    """`pid` and all its descendants (the inference workers are children of the server)."""
+    pids = [pid]
+    for current in pids:
+        for task in glob.glob(f"/proc/{current}/task/*/children"):
+            try:
+                with open(task) as f:
+                    pids.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+    return pids
+
+
+def cpu_and_rss(pids):
+    """Total CPU seconds and resident bytes of `pids`."""
+    cpu = rss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+            rss += int(fields[21]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+    return cpu, rss
+
+
+async def sample_server(pid, interval, stop, samples):
+    """Record (cpu %, rss) of the server every `interval` seconds until `stop` is set."""
+    last_cpu, _ = cpu_and_rss(process_tree(pid))
+    last_time = time.perf_counter()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        cpu, rss = cpu_and_rss(process_tree(pid))
+        now = time.perf_counter()
+        samples.append(((cpu - last_cpu) / (now - last_time) * 100, rss))
+        last_cpu, last_time = cpu, now
+
+
+def start_server(port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            # Startup warms the pose pool, so wait until the HTTP port answers
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit("Server exited during startup")
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("Server did not start within 60 s")
+
+
+def summarize(args, clients, samples, elapsed):
+    latencies = [ms for stats in clients for ms in stats.latencies]
+    sent = sum(stats.sent for stats in clients)
+    answered = sum(stats.answered for stats in clients)
+    result = {
+        "route": args.route,
+        "clients": args.clients,
+        "fps": args.fps,
+        "duration": elapsed,
+        "payload": "landmarks" if args.landmarks else "jpeg",
+        "sent": sent,
+        "answered": answered,
+        "throughput": answered / elapsed if elapsed else 0.0,
+        "unanswered": sent - answered,
+        "server_dropped": sum(stats.server_dropped for stats in clients),
+        "errors": sum(stats.errors for stats in clients),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+    if samples:
+        cpu = [c for c, _ in samples]
+        result.update(
+            cpu_mean_pct=sum(cpu) / len(cpu),
+            cpu_max_pct=max(cpu),
+            rss_max_mb=max(r for _, r in samples) / 2**20,
+        )
+    return result
+
+
+def report(result, baseline=None):
+    print(f"route={result['route']} clients={result['clients']} fps={result['fps']} payload={result['payload']} duration={result['duration']:.1f}s")
+    for key, label, unit in (
+        ("throughput", "throughput", "frames/s"),
+        ("p50_ms", "latency p50", "ms"),
+        ("p95_ms", "latency p95", "ms"),
+        ("p99_ms", "latency p99", "ms"),
+        ("unanswered", "unanswered frames", ""),
+        ("server_dropped", "dropped by server", ""),
+        ("errors", "error replies", ""),
+        ("cpu_mean_pct", "server cpu mean", "%"),
+        ("cpu_max_pct", "server cpu max", "%"),
+        ("rss_max_mb", "server rss max", "MB"),
+    ):
+        if key not in result:
+            continue
+        line = f"{label:>18}: {result[key]:10.1f} {unit}"
+        if baseline and key in baseline:
+            delta = result[key] - baseline[key]
+            change = f" ({delta / baseline[key] * 100:+.1f}%)" if baseline[key] else ""
+            line += f"   baseline {baseline[key]:.1f}, {delta:+.1f}{change}"
+        print(line)
+
+
+async def run(args):
+    messages = build_messages(args)
+    query = f"?{args.query}" if args.query else ""
+    url = f"{args.url.rstrip('/')}{args.route}{query}"
+
+    server = start_server(args.port) if args.start_server else None
+    pid = server.pid if server else args.server_pid
+    try:
+        stop = asyncio.Event()
+        samples = []
+        sampler = asyncio.create_task(sample_server(pid, 0.5, stop, samples)) if pid else None
+
+        clients = [ClientStats() for _ in range(args.clients)]
+        started = time.perf_counter()
+        # Clients start from different points of the recording, like independent users
+        results = await asyncio.gather(
+            *(
+                run_client(url, messages, args.fps, args.duration, args.grace, i * len(messages) // args.clients, stats)
+                for i, stats in enumerate(clients)
+            ),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if sampler:
+            await sampler
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        print(f"client failures: {len(failures)} (first: {failures[0]!r})")
+    return summarize(args, clients, samples, min(elapsed, args.duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--route", default="/ws", help="/ws, /ws/annotated or /ws/workout")
+    parser.add_argument("--query", default="", help="query string, e.g. exercise=squat&profile=lite")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--grace", type=float, default=2, help="seconds to wait for outstanding replies")
+    parser.add_argument("--frames", help="directory or glob of JPEG frames to replay")
+    parser.add_argument("--landmarks", help=".npy dump of (frames, 33, 2-4) normalized landmarks to replay")
+    parser.add_argument("--width", type=int, default=640, help="frame width the landmark dump was recorded at")
+    parser.add_argument("--height", type=int, default=480, help="frame height the landmark dump was recorded at")
+    parser.add_argument("--exercise", help="exercise declared in every frame")
+    parser.add_argument("--server-pid", type=int, help="uvicorn pid to sample CPU/RSS from")
+    parser.add_argument("--start-server", action="store_true", help="start uvicorn on --port for the run")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()